@@ -2,16 +2,29 @@ from eventing.event_queue import Event
 from .serializers import *
 
 
+# Events broadcast to clients are sent to the players of their game. They
+# all keep the Normal priority, so they are sent in the order they were
+# published and eg. a cancelled game is announced before its players start
+# the next one. Events handled by the Lobby and broadcast events have no
+# routing key, so a ShardedEventQueue handles them all in its first shard,
+# in order. The events translated from the messages of a client, and the
+# PlayerLeftEvent after them, reach it in the order the client sent them.
+
+
 class LaunchGameEvent(Event):
   """Event to send when it may be possible
   that a new game can be launched
 
   Eg: is always sent when a player connects
   """
+  __slots__ = ()
+  coalesce = True
 
 
 class GameStartedEvent(Event):
   """Sent when a new game was started"""
+  __slots__ = ('game',)
+
   def __init__(self, game):
     super().__init__()
     self.game = game
@@ -25,6 +38,8 @@ class GameStartedEvent(Event):
 
 class PlayerNameEvent(Event):
   """Sent when a player sends his name"""
+  __slots__ = ('player', 'name')
+
   def __init__(self, player, name):
     super().__init__()
     self.player = player
@@ -33,6 +48,8 @@ class PlayerNameEvent(Event):
 
 class PlayerMoveEvent(Event):
   """Sent when a player has sent a move"""
+  __slots__ = ('player', 'x', 'y', 'orientation')
+
   def __init__(self, player, x, y, orientation):
     super().__init__()
     self.player = player
@@ -43,6 +60,17 @@ class PlayerMoveEvent(Event):
 
 class PlayerCannotMoveEvent(Event):
   """Sent when a player says he cannot move anymore"""
+  __slots__ = ('player',)
+
+  def __init__(self, player):
+    super().__init__()
+    self.player = player
+
+
+class PlayerLeftEvent(Event):
+  """Sent when a player disconnected, after all of his messages"""
+  __slots__ = ('player',)
+
   def __init__(self, player):
     super().__init__()
     self.player = player
@@ -50,6 +78,9 @@ class PlayerCannotMoveEvent(Event):
 
 class BadMessageReceivedEvent(Event):
   """Sent when a player's message cannot be interpreted"""
+  __slots__ = ('player', 'content')
+  routed_by = 'player'
+
   def __init__(self, player, content):
     super().__init__()
     self.player = player
@@ -58,6 +89,8 @@ class BadMessageReceivedEvent(Event):
 
 class DisqualifyPlayerEvent(Event):
   """Sent when a player is disqualified"""
+  __slots__ = ('player', 'reason')
+
   def __init__(self, player, reason):
     super().__init__()
     self.player = player
@@ -66,6 +99,8 @@ class DisqualifyPlayerEvent(Event):
 
 class MoveAcceptedEvent(Event):
   """Sent when a player's move has been accepted"""
+  __slots__ = ('game', 'placed_piece', 'next_piece')
+
   def __init__(self, game, placed_piece, next_piece):
     super().__init__()
     self.game = game
@@ -77,12 +112,17 @@ class MoveAcceptedEvent(Event):
       'type': 'moveaccepted',
       'game': GameSerializer.serialize(self.game),
       'placed_piece': PlacedPieceSerializer.serialize(self.placed_piece),
-      'next_piece': PieceSerializer.serialize(self.next_piece)
+      'next_piece': PieceSerializer.serialize(self.next_piece) if self.next_piece else None
     }
 
 
 class GameIsOverEvent(Event):
   """Sent when no more moves in a game are possible"""
+  __slots__ = ('game',)
+
+  def __init__(self, game):
+    super().__init__()
+    self.game = game
 
   def to_json(self):
     return {
@@ -94,23 +134,29 @@ class GameEndedEvent(Event):
   """Sent when a game has ended and scores and winner
   have been calculated
   """
-  def __init__(self, winner, scores):
+  __slots__ = ('game', 'winner', 'scores')
+
+  def __init__(self, game, winner, scores):
     super().__init__()
+    self.game = game
     self.winner = winner
     self.scores = scores
 
   def to_json(self):
     scores_serial = {player.id: score for player, score in self.scores.items()}
+    winner_serial = PlayerSerializer.serialize(self.winner) if self.winner else None
 
     return {
       'type': 'gameended',
-      'winner': PlayerSerializer.serialize(self.winner),
+      'winner': winner_serial,
       'scores': scores_serial
     }
 
 
 class GameCancelledEvent(Event):
   """Sent when a game must be cancelled because of a disqualification"""
+  __slots__ = ('game', 'reason')
+
   def __init__(self, game, reason):
     super().__init__()
     self.game = game
@@ -124,8 +170,23 @@ class GameCancelledEvent(Event):
     }
 
 
+class GameClosedEvent(Event):
+  """Sent after a game ended or was cancelled, when its players are free again
+
+  Holds the ids of the players, the game may have been judged in another
+  process.
+  """
+  __slots__ = ('players',)
+
+  def __init__(self, players):
+    super().__init__()
+    self.players = players
+
+
 class FirstTurnEvent(Event):
   """Sent when the first turn should be made"""
+  __slots__ = ('game', 'piece')
+
   def __init__(self, game, piece):
     super().__init__()
     self.game = game
@@ -1,7 +1,7 @@
 from enum import Enum
 from .events import *
 from .logic import game, piece
-from net.server import ClientConnectedEvent, ClientDisconnectedEvent
+from net.server import ClientConnectedEvent
 
 import random
 
@@ -18,36 +18,76 @@ class PlayerProxy(object):
     self.objectives = None
     self.in_game = False
 
-  def rename(self, event):
-    self.name = event.name
+  def rename(self, name):
+    self.name = name
 
   def join(self, game):
     self.in_game = True
 
   def leave(self, game):
+    # objectives are kept for the scores of the game just left,
+    # they are assigned again for the next game
     self.in_game = False
-    self.objectives = None
 
   def playing(self):
     return self.in_game
 
 
+def piece_set(pieces='official', piece_count=28, piece_width=(1, 3), piece_height=(1, 3),
+              seed=None):
+  """Return a function creating the pieces of a new game.
+
+  pieces is 'official' or 'generated', the remaining arguments configure
+  generated pieces.
+  """
+  if pieces == 'official':
+    return piece.Piece.official_pieces
+
+  rng = random.Random(seed)
+
+  def generated_pieces():
+    return piece.Piece.generated_pieces(piece_count, rng, widths=piece_width,
+                                        heights=piece_height)
+
+  return generated_pieces
+
+
 class Lobby(object):
-  def __init__(self):
+  """Matches connected players and starts games between them.
+
+  Every two free players start a game, so several games run at once.
+  Their moves are judged by a Referee, which may run in another process,
+  and the players of a game are free again once the Referee closed it.
+  """
+  def __init__(self, board_size=18, pieces=piece.Piece.official_pieces, rng=None):
+    """Create a lobby for games on boards of board_size.
+
+    pieces is called for the list of pieces of every new game, and
+    participants are drawn with rng.
+    """
+    self.board_size = board_size
+    self.pieces = pieces
+    self.rng = rng or random.Random()
     self.players = {}
-    self.game = None
+    # player id -> running game
+    self.games = {}
+
+  @classmethod
+  def from_settings(clss, settings):
+    """Create a lobby from a dict of board_size, seed and piece_set arguments."""
+    pieces = piece_set(settings['pieces'], settings['piece_count'],
+                       settings['piece_width'], settings['piece_height'],
+                       settings['seed'])
+    return clss(settings['board_size'], pieces, random.Random(settings['seed']))
 
   def __call__(self, event):
     event_queue = event.event_queue
     event_queue.register(ClientConnectedEvent, self.client_connected)
-    event_queue.register(ClientDisconnectedEvent, self.client_disconnected)
+    event_queue.register(PlayerLeftEvent, self.player_left)
     event_queue.register(LaunchGameEvent, self.launch_game)
     event_queue.register(GameStartedEvent, self.game_started)
     event_queue.register(PlayerNameEvent, self.player_name)
-    event_queue.register(PlayerMoveEvent, self.player_move)
-    event_queue.register(PlayerCannotMoveEvent, self.player_cannot_move)
-    event_queue.register(GameIsOverEvent, self.game_is_over)
-    event_queue.register(DisqualifyPlayerEvent, self.disqualify_player)
+    event_queue.register(GameClosedEvent, self.game_closed)
 
   async def client_connected(self, event):
     assert event.id not in self.players
@@ -57,99 +97,167 @@ class Lobby(object):
     await event.event_queue.publish(reply)
 
   async def launch_game(self, event):
-    if not self.can_start_game():
-      return
-
-    game = self.build_game()
-    reply = GameStartedEvent(game)
-    await event.event_queue.publish(reply)
-
-  def can_start_game(self):
-    # Start new game if enough players and there
-    # is no game running
-    return not self.game and len(self.players) >= 2
+    # the players join their games once the GameStartedEvents are handled
+    free = self.free_players()
+    while len(free) >= 2:
+      new_game = self.build_game(free)
+      free = [player for player in free if player not in new_game.players]
+      reply = GameStartedEvent(new_game)
+      await event.event_queue.publish(reply)
 
-  def build_game(self):
-    board = game.Board(18)
-    player1, player2 = self.choose_participants()
-    pieces = piece.Piece.official_pieces()
+  def free_players(self):
+    """Return the connected players that are not in a game."""
+    return [player for player in self.players.values() if not player.playing()]
+
+  def build_game(self, players=None):
+    """Build a game between two of players, by default of the free players."""
+    # every placement would update the tracked shapes, while is_over is
+    # only asked when a player claims it
+    board = game.Board(self.board_size)
+    player1, player2 = self.choose_participants(players or self.free_players())
+    pieces = self.pieces()
     new_game = game.Game(board, [player1, player2], pieces)
 
     return new_game
 
-  def choose_participants(self):
+  def choose_participants(self, players):
     objectiveNS = [game.Board.Side.North, game.Board.Side.South]
     objectiveWE = [game.Board.Side.West, game.Board.Side.East]
 
-    players = list(self.players.values())
-    player1, player2 = random.sample(players, 2)
+    player1, player2 = self.rng.sample(players, 2)
     player1.objectives = objectiveNS
     player2.objectives = objectiveWE
     return player1, player2
 
-  async def client_disconnected(self, event):
-    assert event.id in self.players
+  async def player_left(self, event):
+    assert event.player in self.players
 
-    player = self.players.pop(event.id, None)
+    player = self.players.pop(event.player, None)
     if player.playing():
       reply = DisqualifyPlayerEvent(player, Disqualification.QuitGame)
       await event.event_queue.publish(reply)
 
   def player_name(self, event):
-    player = self.players[event.id]
+    player = self.players[event.player]
     player.rename(event.name)
 
+  async def game_started(self, event):
+    """Let the players join the game, a player who left meanwhile quits it."""
+    for gameplayer in event.game.players:
+      # players are looked up by id, since a game replayed from a journal
+      # has players of its own
+      player = self.players.get(gameplayer.id)
+      if player is None:
+        reply = DisqualifyPlayerEvent(gameplayer, Disqualification.QuitGame)
+        await event.event_queue.publish(reply)
+      else:
+        player.join(event.game)
+        self.games[player.id] = event.game
+
+  async def game_closed(self, event):
+    for id in event.players:
+      closed_game = self.games.pop(id, None)
+      player = self.players.get(id)
+      if player:
+        player.leave(closed_game)
+
+    reply = LaunchGameEvent()
+    await event.event_queue.publish(reply)
+
+
+class Referee(object):
+  """Judges the moves of the running games.
+
+  A finished or cancelled game is announced to its players and then
+  closed with a GameClosedEvent. Events of players without a running
+  game are ignored.
+  """
+  def __init__(self):
+    # player id -> running game
+    self.games = {}
+
+  def __call__(self, event):
+    event_queue = event.event_queue
+    event_queue.register(GameStartedEvent, self.game_started)
+    event_queue.register(PlayerMoveEvent, self.player_move)
+    event_queue.register(PlayerCannotMoveEvent, self.player_cannot_move)
+    event_queue.register(GameIsOverEvent, self.game_is_over)
+    event_queue.register(DisqualifyPlayerEvent, self.disqualify_player)
+
+  def find(self, id):
+    """Return the running game of the player with id and its player in it.
+
+    Both are None if the player is not in a game.
+    """
+    running = self.games.get(id)
+    if running is None:
+      return None, None
+
+    for gameplayer in running.players:
+      if gameplayer.id == id:
+        return running, gameplayer
+
+  def is_running(self, running):
+    return any(self.games.get(p.id) is running for p in running.players)
+
+  async def game_started(self, event):
+    running = event.game
+    for gameplayer in running.players:
+      self.games[gameplayer.id] = running
+
+    reply = FirstTurnEvent(running, running.current_piece)
+    await event.event_queue.publish(reply)
+
   async def player_move(self, event):
-    player = self.players[event.id]
+    running, player = self.find(event.player)
+    if not running:
+      return
+
     x = event.x
     y = event.y
     orientation = event.orientation
 
     try:
-      placed_piece = self.game.make_turn(player, self.game.current_piece, x, y, orientation)
-      reply = MoveAcceptedEvent(self.game, placed_piece, self.game.current_piece)
-    except GameException as e:
+      placed_piece = running.make_turn(player, running.current_piece, x, y, orientation)
+      # there is no next piece after the last turn
+      next_piece = running.current_piece if running.pieces else None
+      reply = MoveAcceptedEvent(running, placed_piece, next_piece)
+    except game.GameException as e:
       reply = DisqualifyPlayerEvent(player, Disqualification.InvalidMove)
 
     await event.event_queue.publish(reply)
 
   async def player_cannot_move(self, event):
-    player = self.players[event.id]
+    running, player = self.find(event.player)
+    if not running:
+      return
 
-    if self.game.is_over():
-      reply = GameIsOverEvent()
+    if running.is_over():
+      reply = GameIsOverEvent(running)
     else:
       reply = DisqualifyPlayerEvent(player, Disqualification.InvalidMove)
 
     await event.event_queue.publish(reply)
 
-  async def game_started(self, event):
-    self.game = event.game
-    for gameplayer in self.game.players:
-      gameplayer.join(self.game)
+  async def game_is_over(self, event):
+    if not self.is_running(event.game):
+      return
 
-    reply = FirstTurnEvent(self.game, self.game.current_piece)
-    await event.event_queue.publish(reply)
+    winner, scores = event.game.winner()
+    await self.close(event, event.game, GameEndedEvent(event.game, winner, scores))
 
   async def disqualify_player(self, event):
-    for gameplayer in self.game.players.values():
-      gameplayer.leave(self.game)
-
-    reply = GameCancelledEvent(self.game, event.reason)
-    self.game = None
-    await event.event_queue.publish(reply)
+    # eg. both players quit
+    running, _ = self.find(event.player.id)
+    if not running:
+      return
 
-    reply = LaunchGameEvent()
-    await event.event_queue.publish(reply)
+    await self.close(event, running, GameCancelledEvent(running, event.reason))
 
-  async def game_is_over(self, event):
-    for gameplayer in self.game.players:
-      gameplayer.leave(self.game)
+  async def close(self, event, running, reply):
+    players = [gameplayer.id for gameplayer in running.players]
+    for id in players:
+      del self.games[id]
 
-    winner, scores = self.game.winner()
-    reply = GameEndedEvent(winner, scores)
-    self.game = None
-    await event.event_queue.publish(reply)
-
-    reply = LaunchGameEvent()
     await event.event_queue.publish(reply)
+    await event.event_queue.publish(GameClosedEvent(players))
@@ -30,6 +30,8 @@ class Point:
     rotate_about  -- rotate around another point
     """
 
+    __slots__ = ('x', 'y')
+
     def __init__(self, x=0.0, y=0.0):
         self.x = x
         self.y = y
@@ -167,6 +169,8 @@ class Rect:
     expanded_by  -- grow (or shrink)
     """
 
+    __slots__ = ('left', 'top', 'right', 'bottom')
+
     def __init__(self, pt1, pt2):
         """Initialize a rectangle from two points."""
         self.set_points(pt1, pt2)
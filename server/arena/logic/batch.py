@@ -0,0 +1,121 @@
+"""Vectorized validation of many placements at once.
+
+Requires numpy, which is an optional dependency of the server. The scalar
+checks on Board remain the reference implementation.
+"""
+
+import numpy as np
+
+from .piece import Orientation
+
+
+ORIENTATIONS = list(Orientation)
+
+# dock states in BoardArrays.docks
+NO_DOCK = 0
+OPEN_DOCK = 1
+OPEN_CONNECTOR = 2
+
+
+class BoardArrays(object):
+  """A board's occupancy and open docks as numpy arrays.
+
+  Only the occupancy follows later placements, the dock arrays are a
+  snapshot. Both dock arrays are indexed by doubled coordinates [2y, 2x].
+  """
+  def __init__(self, board):
+    size = board.size
+    # shares memory with the board, so it follows later placements
+    self.occupancy = np.frombuffer(board.occupancy, dtype=np.uint8).reshape(size, size)
+    self.docks = np.zeros((2*size + 1, 2*size + 1), dtype=np.int8)
+    self.owners = np.full((2*size + 1, 2*size + 1), -1, dtype=np.int32)
+
+    owner_ids = {id(p): n for n, p in enumerate(board.pieces)}
+    limit = 2 * size
+    for (x, y), (is_connector, owner) in board.docks.items():
+      if 0 <= x <= limit and 0 <= y <= limit:
+        self.docks[y, x] = OPEN_CONNECTOR if is_connector else OPEN_DOCK
+        self.owners[y, x] = owner_ids[id(owner)]
+
+
+def orientation_codes(orientations):
+  """Convert Orientations or their indices in ORIENTATIONS into indices."""
+  codes = np.asarray(orientations)
+  if codes.dtype == object:
+    codes = np.array([ORIENTATIONS.index(Orientation(o)) for o in codes.ravel()],
+                     dtype=np.int64).reshape(codes.shape)
+  return codes.astype(np.int64, copy=False)
+
+
+def coordinates(values):
+  """Convert integer coordinates into an int64 array.
+
+  Other values are rejected rather than truncated, the scalar checks do
+  not accept unaligned placements either.
+  """
+  values = np.asarray(values)
+  if values.size and not np.issubdtype(values.dtype, np.integer):
+    raise TypeError(f'coordinates must be integers, not {values.dtype}')
+  return values.astype(np.int64, copy=False)
+
+
+def evaluate_placements(board, piece, xs, ys, orientations, *, chunk_size=1 << 16):
+  """Return a boolean mask telling which placements of piece are valid.
+
+  xs, ys and orientations are broadcast against each other. Orientations
+  may be given as Orientation members or as indices into ORIENTATIONS.
+  Raises TypeError for coordinates that are not integers.
+  """
+  xs, ys, codes = np.broadcast_arrays(coordinates(xs),
+                                      coordinates(ys),
+                                      orientation_codes(orientations))
+  shape = xs.shape
+  xs = xs.ravel()
+  ys = ys.ravel()
+  codes = codes.ravel()
+
+  arrays = BoardArrays(board)
+  valid = np.zeros(xs.shape, dtype=bool)
+
+  for code, orientation in enumerate(ORIENTATIONS):
+    selected = np.flatnonzero(codes == code)
+    if len(selected) == 0:
+      continue
+
+    template = piece.template(orientation)
+    for start in range(0, len(selected), chunk_size):
+      chunk = selected[start:start + chunk_size]
+      valid[chunk] = evaluate_template(arrays, board.size, template, xs[chunk], ys[chunk])
+
+  return valid.reshape(shape)
+
+
+def evaluate_template(arrays, size, template, xs, ys):
+  """Check placements of one template at origins xs, ys."""
+  valid = ((xs + template.left >= 0) & (xs + template.right <= size) &
+           (ys + template.top >= 0) & (ys + template.bottom <= size))
+
+  inside = np.flatnonzero(valid)
+  x = xs[inside, None]
+  y = ys[inside, None]
+
+  cell_x, cell_y = np.array(template.cells, dtype=np.int64).T
+  collides = arrays.occupancy[y + cell_y, x + cell_x].any(axis=1)
+
+  dock_x, dock_y, is_connector = np.array(template.docks, dtype=np.int64).T
+  is_connector = is_connector.astype(bool)
+  states = arrays.docks[2*y + dock_y, 2*x + dock_x]
+  owners = arrays.owners[2*y + dock_y, 2*x + dock_x]
+
+  shared = states != NO_DOCK
+  other_is_connector = states == OPEN_CONNECTOR
+  mismatch = shared & (other_is_connector != is_connector)
+  match = other_is_connector & is_connector
+
+  # a neighbour is compatible if none of the docks shared with it mismatch
+  same_owner = (owners[:, :, None] == owners[:, None, :]) & shared[:, :, None]
+  incompatible = (same_owner & mismatch[:, None, :]).any(axis=2)
+  connects = (match & ~incompatible).any(axis=1)
+
+  valid[inside] = ~collides & connects
+  return valid
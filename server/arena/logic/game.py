@@ -1,8 +1,9 @@
-from collections import Counter, deque
+from collections import Counter, deque, namedtuple
 from enum import Enum
 
 from .piece import Orientation, Piece, PlacedPiece
-from .placements import ValidPlacements
+from .placements import IncrementalPlacements, ValidPlacements
+from .zobrist import placed_piece_key
 from ._shapes import Point, Rect
 
 
@@ -22,6 +23,10 @@ class WrongPiecePlayedError(GameException):
   pass
 
 
+class NoMoveToUndoError(GameException):
+  pass
+
+
 class Board(object):
   class Side(Enum):
     North = 'north'
@@ -29,14 +34,40 @@ class Board(object):
     South = 'south'
     West  = 'west'
 
-  def __init__(self, size):
+  def __init__(self, size, incremental=False, transpositions=None):
+    """Create an empty board.
+
+    In incremental mode the valid placements of every queried piece
+    shape are kept and updated on each placement instead of being
+    recomputed on every call to valid_placements.
+
+    Otherwise valid placements are memoized by position in the
+    TranspositionTable transpositions if given, which may be shared
+    between boards and with search code.
+    """
     self.size = size
+    self.incremental = incremental
+    self.transpositions = transpositions
+    # Zobrist hash of the position, independent of the order of moves
+    self.zobrist = 0
     self.pieces = []
+    # one byte per unit cell in row-major order, non-zero iff covered
+    self.occupancy = bytearray(size * size)
+    # open edge midpoints in doubled coordinates (2x, 2y) -> (is_connector, owning piece)
+    self.docks = {}
+    # open connectors strictly inside the board, where pieces can dock
+    self.anchors = {}
+    # Board.Side -> number of connectors on that side of the board
+    self.connectors = Counter()
+    # per placed piece the docks it closed, to undo placements
+    self.closed_docks = []
+    # piece shape -> IncrementalPlacements, only used in incremental mode
+    self.placements = {}
 
     assert size > 0, 'field size must be positive'
     assert size % 2 == 0, 'field size not even'
 
-  def place_initial(self, piece, owner):
+  def place_initial(self, piece, owner=None):
     """Place the first stone on the board.
 
     Collisions and connections with other stones are not checked
@@ -47,7 +78,7 @@ class Board(object):
     if not self.contains(placed_piece):
       raise InvalidPlacementError()
 
-    self.pieces.append(placed_piece)
+    self.occupy(placed_piece)
     return placed_piece
 
   def validate_placement(self, placed_piece):
@@ -56,6 +87,9 @@ class Board(object):
     Raise InvalidPlacementError if placement is not valid.
     """
 
+    if not placed_piece.is_aligned():
+      raise InvalidPlacementError('Piece not aligned to grid')
+
     if not self.contains(placed_piece):
       raise InvalidPlacementError('Piece not in board')
 
@@ -71,7 +105,92 @@ class Board(object):
 
     placed_piece = PlacedPiece(piece, x, y, orientation, player)
     self.validate_placement(placed_piece)
+    self.occupy(placed_piece)
+    return placed_piece
+
+  def occupy(self, placed_piece):
+    """Add an already validated piece to the board."""
+    size = self.size
+    for x, y in placed_piece.cells():
+      self.occupancy[y * size + x] = 1
+
+    # An edge is shared by at most two non-overlapping pieces, so a dock
+    # that is already open gets closed by the new piece and can never be
+    # part of a connection again.
+    closed_docks = []
+    for x, y, is_connector in placed_piece.docks():
+      key = (x, y)
+      if key in self.docks:
+        closed_docks.append((key, self.docks.pop(key)))
+        self.anchors.pop(key, None)
+      else:
+        self.docks[key] = (is_connector, placed_piece)
+        if is_connector and self.is_inside(x, y):
+          self.anchors[key] = None
+
+      if is_connector:
+        side = self.side_of(x, y)
+        if side is not None:
+          self.connectors[side] += 1
+
+    self.closed_docks.append(closed_docks)
     self.pieces.append(placed_piece)
+    self.zobrist ^= placed_piece_key(placed_piece)
+
+    for placements in self.placements.values():
+      placements.update(placed_piece)
+
+  def is_inside(self, x, y):
+    """Check if a point in doubled coordinates lies strictly inside the board."""
+    limit = 2 * self.size
+    return 0 < x < limit and 0 < y < limit
+
+  def side_of(self, x, y):
+    """Return the Side a point in doubled coordinates lies on, or None."""
+    if x == 0:
+      return self.Side.West
+    if y == 0:
+      return self.Side.North
+    if x == 2 * self.size:
+      return self.Side.East
+    if y == 2 * self.size:
+      return self.Side.South
+
+    return None
+
+  def unplace(self):
+    """Remove the most recently placed piece from the board.
+
+    Restores the board to the state before that piece was placed, in time
+    proportional to the size of the piece.
+    """
+    placed_piece = self.pieces.pop()
+    closed_docks = self.closed_docks.pop()
+    self.zobrist ^= placed_piece_key(placed_piece)
+
+    size = self.size
+    for x, y in placed_piece.cells():
+      self.occupancy[y * size + x] = 0
+
+    for x, y, is_connector in placed_piece.docks():
+      self.docks.pop((x, y), None)
+      self.anchors.pop((x, y), None)
+
+      if is_connector:
+        side = self.side_of(x, y)
+        if side is not None:
+          self.connectors[side] -= 1
+
+    self.docks.update(closed_docks)
+    for (x, y), (is_connector, owner) in closed_docks:
+      if is_connector and self.is_inside(x, y):
+        self.anchors[x, y] = None
+
+    for shape, placements in list(self.placements.items()):
+      # placements tracked only since after this piece are rebuilt lazily
+      if not placements.revert():
+        del self.placements[shape]
+
     return placed_piece
 
   def contains(self, piece):
@@ -80,15 +199,139 @@ class Board(object):
     return board_area.contains_rect(piece.area())
 
   def collides_any(self, piece):
-    """Check if piece collides with any piece on the board."""
-    return any(piece.collides(placed) for placed in self.pieces)
+    """Check if piece collides with any piece on the board.
+
+    Only the cells covered by piece are looked up in the occupancy grid,
+    so the check does not depend on the number of placed pieces.
+    """
+    size = self.size
+    occupancy = self.occupancy
+    return any(occupancy[y * size + x]
+               for x, y in piece.cells()
+               if 0 <= x < size and 0 <= y < size)
 
   def connects_one(self, piece):
     """Check if piece connects to any piece on the board."""
-    return any(piece.connects_to(placed) for placed in self.pieces)
+    return self.connects_at(piece.template, int(piece.x), int(piece.y))
+
+  def is_valid_at(self, template, x, y):
+    """Check if a piece with template can be placed at integer x, y.
+
+    Boolean counterpart of validate_placement that does not need a
+    PlacedPiece.
+    """
+    return (self.contains_at(template, x, y) and
+            not self.collides_at(template, x, y) and
+            self.connects_at(template, x, y))
+
+  def contains_at(self, template, x, y):
+    """Check if the board contains a piece with template at x, y."""
+    size = self.size
+    return (0 <= x + template.left and x + template.right <= size and
+            0 <= y + template.top and y + template.bottom <= size)
+
+  def collides_at(self, template, x, y):
+    """Check if a piece with template at x, y collides with any piece.
+
+    The piece must be contained in the board.
+    """
+    size = self.size
+    occupancy = self.occupancy
+    origin = y * size + x
+    return any(occupancy[origin + dy * size + dx] for dx, dy in template.cells)
+
+  def connects_at(self, template, x, y):
+    """Check if a piece with template at x, y connects to any piece.
+
+    Same rules as PlacedPiece.connects_to, but only the piece's own
+    docking points are looked up in the index of open docks.
+    """
+    x *= 2
+    y *= 2
+    docks = self.docks
+
+    # per neighbour: None after a mismatch, else if connectors matched
+    neighbours = {}
+    for dx, dy, dock_is_connector in template.docks:
+      open_dock = docks.get((x + dx, y + dy))
+      if open_dock is None:
+        continue
+
+      is_connector, owner = open_dock
+      connected = neighbours.get(owner, False)
+      if connected is None:
+        continue
+
+      if is_connector != dock_is_connector:
+        neighbours[owner] = None
+      else:
+        neighbours[owner] = connected or is_connector
+
+    return any(neighbours.values())
+
+  def evaluate_placements(self, piece, xs, ys, orientations):
+    """Check many placements of piece at once, return a boolean mask.
+
+    Vectorized counterpart of is_valid_at for arrays of candidates, see
+    batch.evaluate_placements. Requires numpy.
+    """
+    from .batch import evaluate_placements
+    return evaluate_placements(self, piece, xs, ys, orientations)
 
   def valid_placements(self, piece):
-    yield from ValidPlacements(self, piece)
+    if self.incremental:
+      positions = list(self.incremental_placements(piece))
+    elif self.transpositions is not None:
+      positions = self.memoized_placements(piece)
+    else:
+      yield from ValidPlacements(self, piece)
+      return
+
+    for x, y, orientation in positions:
+      yield PlacedPiece(piece, x, y, orientation, None)
+
+  def memoized_placements(self, piece):
+    """Return the valid positions of piece through the transposition table."""
+    key = ('placements', self.size, self.zobrist, piece.shape)
+    positions = self.transpositions.get(key)
+    if positions is None:
+      positions = tuple(ValidPlacements(self, piece).positions())
+      self.transpositions.put(key, positions)
+
+    return positions
+
+  def has_valid_placement(self, piece):
+    """Check if piece can be placed anywhere on the board.
+
+    Stops at the first valid placement. Connectors of the most recently
+    placed pieces are tried first, they are the least likely to be
+    surrounded already.
+    """
+    if piece.shape in self.placements:
+      return len(self.placements[piece.shape]) > 0
+
+    if self.transpositions is not None:
+      key = ('placements', self.size, self.zobrist, piece.shape)
+      if key in self.transpositions:
+        return len(self.transpositions.get(key)) > 0
+
+    placements = ValidPlacements(self, piece)
+    anchors = placements.anchors()
+    anchors.reverse()
+    return any(True for _ in placements.positions(anchors))
+
+  def forget_placements(self, piece):
+    """Stop tracking the valid placements of piece's shape incrementally."""
+    self.placements.pop(piece.shape, None)
+
+  def incremental_placements(self, piece):
+    """Return the IncrementalPlacements for piece's shape."""
+    try:
+      return self.placements[piece.shape]
+    except KeyError:
+      placements = IncrementalPlacements(self, piece)
+      self.placements[piece.shape] = placements
+      return placements
 
 
 class Player(object):
@@ -99,6 +342,10 @@ class Player(object):
     assert len(objectives) == 2, 'invalid player objectives'
 
 
+GameSnapshot = namedtuple('GameSnapshot', ['moves'])
+GameSnapshot.__doc__ = """Position of a game as the (x, y, orientation) of its turns."""
+
+
 class Game(object):
   def __init__(self, board, players, pieces):
     self.board = board
@@ -108,6 +355,9 @@ class Game(object):
     # we give the initial piece a random owner to avoid None
     board.place_initial(initial_piece, self.current_player)
     self.pieces = deque(playing_pieces)
+    # shapes of the remaining pieces, to stop tracking placements of
+    # shapes that cannot be played anymore
+    self.remaining_shapes = Counter(p.shape for p in self.pieces)
 
     assert len(self.pieces) > 0, 'game needs at least one piece'
     assert len(players) >= 2, 'game needs at least two players'
@@ -133,18 +383,59 @@ class Game(object):
 
   def prepare_next_turn(self):
     self.players.rotate()
-    self.pieces.popleft()
+    piece = self.pieces.popleft()
+
+    self.remaining_shapes[piece.shape] -= 1
+    if self.remaining_shapes[piece.shape] == 0:
+      self.board.forget_placements(piece)
+
+  def push_move(self, x, y, orientation):
+    """Make a turn for the current player with the current piece."""
+    return self.make_turn(self.current_player, self.current_piece, x, y, orientation)
+
+  def pop_move(self):
+    """Undo the last turn and return its placed piece."""
+    if len(self.board.pieces) <= 1:
+      raise NoMoveToUndoError()
+
+    placed_piece = self.board.unplace()
+    self.pieces.appendleft(placed_piece.piece)
+    self.remaining_shapes[placed_piece.piece.shape] += 1
+    self.players.rotate(-1)
+    return placed_piece
+
+  def snapshot(self):
+    """Return an immutable GameSnapshot of the current position."""
+    moves = tuple((p.x, p.y, p.orientation) for p in self.board.pieces[1:])
+    return GameSnapshot(moves)
+
+  def restore(self, snapshot):
+    """Return to the position of a snapshot taken from this game.
+
+    Only the moves after the longest common history are undone and
+    replayed.
+    """
+    moves = self.snapshot().moves
+    common = 0
+    for move, other in zip(moves, snapshot.moves):
+      if move != other:
+        break
+      common += 1
+
+    for _ in range(len(moves) - common):
+      self.pop_move()
+
+    for x, y, orientation in snapshot.moves[common:]:
+      self.push_move(x, y, orientation)
 
   def is_over(self):
-    no_more_pieces = len(self.pieces) == 0
-    no_more_placements = len(board.valid_placements(self.current_piece)) == 0
-    return no_more_pieces or no_more_placements
+    if len(self.pieces) == 0:
+      return True
+
+    return not self.board.has_valid_placement(self.current_piece)
 
   def scores(self):
-    sides = Counter(dock.board_side(self.board)
-                    for placed_piece in self.board.pieces
-                    for dock in placed_piece.docking_points()
-                    if dock.is_connector)
+    sides = self.board.connectors
 
     scores = {}
     for player in self.players:
@@ -152,3 +443,11 @@ class Game(object):
       scores[player] = sides[side1] * sides[side2]
 
     return scores
+
+  def winner(self):
+    """Return the winning player, or None on a draw, and the scores."""
+    scores = self.scores()
+    best = max(scores.values())
+    leaders = [player for player, score in scores.items() if score == best]
+    winner = leaders[0] if len(leaders) == 1 else None
+    return winner, scores
@@ -1,4 +1,5 @@
 from enum import Enum
+from numbers import Integral
 
 from ._shapes import Point, Rect
 
@@ -10,29 +11,57 @@ class Orientation(Enum):
   West  = 'west'
 
 
+# unit vectors (e1, e2) of a piece's area per orientation, see
+# PlacedPiece.units_for_orientation
+UNITS = {
+  Orientation.North: ((-1, 0), (0, -1)),
+  Orientation.East:  ((0, -1), (1, 0)),
+  Orientation.South: ((1, 0), (0, 1)),
+  Orientation.West:  ((0, 1), (-1, 0)),
+}
+
+
 class DockingPoint(object):
+  """A point where pieces can connect, the midpoint of an edge.
+
+  Coordinates are stored doubled, so hashing and comparisons only
+  involve integers.
+  """
+  __slots__ = ('x2', 'y2', 'is_connector')
+
   def __init__(self, x, y, is_connector):
-    self.x = x
-    self.y = y
+    self.x2 = int(2 * x)
+    self.y2 = int(2 * y)
     self.is_connector = is_connector
 
-  def board_side(self, board):
-    if self.x == 0:
-      return board.Side.West
-    if self.y == 0:
-      return board.Side.North
-    if self.x == board.size:
-      return board.Side.East
-    if self.y == board.size:
-      return board.Side.South
+  @classmethod
+  def doubled(clss, x2, y2, is_connector):
+    """Create a DockingPoint from doubled coordinates."""
+    dock = clss.__new__(clss)
+    dock.x2 = x2
+    dock.y2 = y2
+    dock.is_connector = is_connector
+    return dock
+
+  @property
+  def x(self):
+    return self.x2 / 2
 
-    return None
+  @property
+  def y(self):
+    return self.y2 / 2
+
+  def board_side(self, board):
+    return board.side_of(self.x2, self.y2)
 
   def __eq__(self, other):
-    return self.x == other.x and self.y == other.y
+    return self.x2 == other.x2 and self.y2 == other.y2
 
   def __hash__(self):
-    return hash((self.x, self.y))
+    return hash((self.x2, self.y2))
+
+  def __repr__(self):
+    return '%s(%r, %r, %r)' % (self.__class__.__name__, self.x, self.y, self.is_connector)
 
 
 class Piece(object):
@@ -49,6 +78,21 @@ class Piece(object):
     assert height > 0, 'height must be positive'
     assert all(0 <= c < 2*width+2*height for c in connectors), 'invalid connector'
 
+    # bit n is set iff edge slot n, counted clockwise from the top left, is a connector
+    self.connector_mask = sum(1 << c for c in set(connectors))
+    # pieces with equal shapes have the same valid placements
+    self.shape = (width, height, self.connector_mask)
+    self.templates = {}
+
+  def template(self, orientation):
+    """Return the cached Template of this piece for orientation."""
+    try:
+      return self.templates[orientation]
+    except KeyError:
+      template = Template(self, Orientation(orientation))
+      self.templates[orientation] = template
+      return template
+
   @staticmethod
   def official_pieces():
     connectors = [
@@ -63,8 +107,95 @@ class Piece(object):
 
     return [Piece(1, 3, c) for c in connectors]
 
+  @staticmethod
+  def generated_pieces(count, rng, widths=(1, 3), heights=(1, 3), density=0.4):
+    """Generate count random pieces.
+
+    Sizes are drawn from the inclusive ranges widths and heights, each
+    edge slot is a connector with probability density and every piece
+    has at least one connector.
+    """
+    pieces = []
+    for _ in range(count):
+      width = rng.randint(*widths)
+      height = rng.randint(*heights)
+      slots = 2*width + 2*height
+      connectors = [c for c in range(slots) if rng.random() < density]
+      if not connectors:
+        connectors = [rng.randrange(slots)]
+
+      pieces.append(Piece(width, height, connectors))
+
+    return pieces
+
+
+class Template(object):
+  """Geometry of a piece in one orientation relative to its origin.
+
+  Placing the piece at (x, y) only translates the offsets. Docking points
+  use doubled coordinates so that edge midpoints are integers, too.
+
+  The connector mask is also rotated onto the four sides of the board:
+  bit i of north and south is the slot i units right of left, bit i of
+  west and east the slot i units below top.
+  """
+  __slots__ = ('left', 'top', 'right', 'bottom', 'cells', 'connector_mask', 'docks',
+               'north', 'east', 'south', 'west')
+
+  def __init__(self, piece, orientation):
+    w = piece.width
+    h = piece.height
+    (e1x, e1y), (e2x, e2y) = UNITS[orientation]
+
+    corner_x = e1x * w + e2x * h
+    corner_y = e1y * w + e2y * h
+    self.left = min(0, corner_x)
+    self.top = min(0, corner_y)
+    self.right = max(0, corner_x)
+    self.bottom = max(0, corner_y)
+
+    self.cells = tuple((x, y)
+                       for y in range(self.top, self.bottom)
+                       for x in range(self.left, self.right))
+
+    # walk the edges clockwise: top, right, bottom right to left and
+    # left bottom to top, in steps of half a unit
+    edges = [
+      (0, 0, e1x, e1y, w),
+      (2*e1x*w, 2*e1y*w, e2x, e2y, h),
+      (2*corner_x, 2*corner_y, -e1x, -e1y, w),
+      (2*e2x*h, 2*e2y*h, -e2x, -e2y, h),
+    ]
+    positions = [(x + dx * (2*n + 1), y + dy * (2*n + 1))
+                 for x, y, dx, dy, steps in edges
+                 for n in range(steps)]
+
+    self.connector_mask = piece.connector_mask
+    self.docks = tuple((x, y, bool(self.connector_mask >> n & 1))
+                       for n, (x, y) in enumerate(positions))
+
+    self.north = self.east = self.south = self.west = 0
+    for x, y, is_connector in self.docks:
+      if not is_connector:
+        continue
+
+      if x % 2:
+        bit = 1 << (x // 2 - self.left)
+        if y == 2 * self.top:
+          self.north |= bit
+        else:
+          self.south |= bit
+      else:
+        bit = 1 << (y // 2 - self.top)
+        if x == 2 * self.left:
+          self.west |= bit
+        else:
+          self.east |= bit
+
 
 class PlacedPiece(object):
+  __slots__ = ('piece', 'x', 'y', 'orientation', 'player', 'template')
+
   def __init__(self, piece, x, y, orientation, player):
     self.piece = piece
     self.x = x
@@ -73,38 +204,87 @@ class PlacedPiece(object):
     self.player = player
 
     assert Orientation(orientation), 'invalid orientation'
+    self.template = piece.template(orientation)
 
   def area(self):
     """Return a Rect describing the area of this piece"""
-    w = self.piece.width
-    h = self.piece.height
-    origin = Point(self.x, self.y)
-    e1, e2 = self.units_for_orientation()
+    t = self.template
+    x = self.x
+    y = self.y
+    return Rect.of(x + t.left, y + t.top, x + t.right, y + t.bottom)
+
+  def cells(self):
+    """Return the (x, y) corners of all unit cells covered by this piece.
+
+    Only meaningful for pieces aligned to the grid.
+    """
+    x = int(self.x)
+    y = int(self.y)
+    return [(x + dx, y + dy) for dx, dy in self.template.cells]
+
+  def docks(self):
+    """Return (x, y, is_connector) of all docking points in doubled coordinates.
+
+    Only meaningful for pieces aligned to the grid.
+    """
+    x = 2 * int(self.x)
+    y = 2 * int(self.y)
+    return [(x + dx, y + dy, c) for dx, dy, c in self.template.docks]
 
-    return Rect(origin, origin + e1 * w + e2 * h)
+  def is_aligned(self):
+    """Check if this piece's origin lies on the integer grid."""
+    return all(isinstance(c, Integral) or (isinstance(c, float) and c.is_integer())
+               for c in (self.x, self.y))
 
   def collides(self, other):
     """Check if this piece collides with/ overlaps another piece."""
     return self.area().overlaps(other.area())
 
   def connects_to(self, other):
-    """Check if this piece connects to another piece."""
-    docks = self.docking_points()
-    other_docks = other.docking_points()
-    commmon_docks = docks & other_docks
+    """Check if this piece connects to another piece.
 
-    assert len(docks) > 0, 'no docking points'
-    assert len(other_docks) > 0, 'no other docking points'
-
-    if len(commmon_docks) == 0:
-      return False
-
-    connectors = {d for d in docks if d.is_connector}
-    other_connectors = {d for d in other_docks if d.is_connector}
-
-    are_docks_compatible = len((commmon_docks & connectors) ^ (commmon_docks & other_connectors)) == 0
-    has_connector_match = len(connectors & other_connectors) > 0
-    return are_docks_compatible and has_connector_match
+    The pieces must share at least one edge slot, agree on the connectors
+    of all shared slots and have a connector in at least one of them.
+    Shared slots are compared side by side with the rotated connector
+    masks of both templates.
+    """
+    a = self.template
+    b = other.template
+    ax = int(self.x)
+    ay = int(self.y)
+    bx = int(other.x)
+    by = int(other.y)
+
+    # (mask, first, last, other mask, other first, other last) per
+    # pair of sides on the same line, first and last bound the side
+    touching = []
+    if ax + a.right == bx + b.left:
+      touching.append((a.east, ay + a.top, ay + a.bottom, b.west, by + b.top, by + b.bottom))
+    if ax + a.left == bx + b.right:
+      touching.append((a.west, ay + a.top, ay + a.bottom, b.east, by + b.top, by + b.bottom))
+    if ay + a.bottom == by + b.top:
+      touching.append((a.south, ax + a.left, ax + a.right, b.north, bx + b.left, bx + b.right))
+    if ay + a.top == by + b.bottom:
+      touching.append((a.north, ax + a.left, ax + a.right, b.south, bx + b.left, bx + b.right))
+
+    shared = False
+    has_connector_match = False
+    for mask, first, last, other_mask, other_first, other_last in touching:
+      lo = max(first, other_first)
+      hi = min(last, other_last)
+      if lo >= hi:
+        continue
+
+      window = (1 << (hi - lo)) - 1
+      connectors = (mask >> (lo - first)) & window
+      other_connectors = (other_mask >> (lo - other_first)) & window
+      if connectors != other_connectors:
+        return False
+
+      shared = True
+      has_connector_match = has_connector_match or connectors != 0
+
+    return shared and has_connector_match
 
   def docking_points(self):
     """Calculate the points where this piece can connect to another piece.
@@ -112,35 +292,7 @@ class PlacedPiece(object):
     Returns a map from points to bool: the map's value is True iff the
     point is a docking point.
     """
-    docking_points = set()
-    origin = Point(self.x, self.y)
-    w = self.piece.width
-    h = self.piece.height
-    e1, e2 = self.units_for_orientation()
-
-    is_connector = (n in self.piece.connectors for n in range(2*w*2*h))
-
-    # top edge
-    top_left = origin + e1 * 0.5
-    for (x, y) in top_left.ray(e1, steps=w):
-      docking_points.add(DockingPoint(x, y, next(is_connector)))
-
-    # right edge
-    top_right = origin + e1 * w + e2 * 0.5
-    for (x, y) in top_right.ray(e2, steps=h):
-      docking_points.add(DockingPoint(x, y, next(is_connector)))
-
-    # bottom edge, right to left
-    bottom_right = origin + e1 * w + e2 * h - e1 * 0.5
-    for (x, y) in bottom_right.ray(-e1, steps=w):
-      docking_points.add(DockingPoint(x, y, next(is_connector)))
-
-    # left edge, bottom to top
-    bottom_left = origin + e2 * h - e2 * 0.5
-    for (x, y) in bottom_left.ray(-e2, steps=h):
-      docking_points.add(DockingPoint(x, y, next(is_connector)))
-
-    return docking_points
+    return {DockingPoint.doubled(x, y, c) for x, y, c in self.docks()}
 
   def units_for_orientation(self):
     """Return the unit vectors for this piece's area according to the current orientation.
@@ -153,16 +305,5 @@ class PlacedPiece(object):
     |  |  | v
     +--+--+
     """
-    ex = Point(1, 0)
-    ey = Point(0, 1)
-
-    if self.orientation == Orientation.North:
-      return (-ex, -ey)
-    elif self.orientation == Orientation.East:
-      return (-ey, ex)
-    elif self.orientation == Orientation.South:
-      return (ex, ey)
-    elif self.orientation == Orientation.West:
-      return (ey, -ex)
-
-    assert Orientation(self.orientation), 'invalid orientation'
+    e1, e2 = UNITS[Orientation(self.orientation)]
+    return (Point(*e1), Point(*e2))
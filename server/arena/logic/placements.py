@@ -1,19 +1,122 @@
+from collections import defaultdict
+
 from .piece import Orientation, Piece, PlacedPiece
 
 
 class ValidPlacements(object):
+  """All valid placements of a piece on a board.
+
+  Every valid placement puts at least one of the piece's connectors onto
+  an open connector of a placed piece. Only origins that produce such a
+  pair are tried, instead of every position on the board.
+  """
   def __init__(self, board, piece):
     self.board = board
     self.piece = piece
 
   def __iter__(self):
-    size = self.board.size + 1
-    for x in range(size):
-      for y in range(size):
-        for o in Orientation:
-          placed_piece = PlacedPiece(self.piece, x, y, o, None)
-          try:
-            self.board.validate_placement(placed_piece)
-            yield placed_piece
-          except:
+    for x, y, orientation in self.positions():
+      yield PlacedPiece(self.piece, x, y, orientation, None)
+
+  def positions(self, anchors=None):
+    """Generate (x, y, orientation) of all valid placements.
+
+    Only placements connecting to one of anchors are generated if given.
+    """
+    board = self.board
+    if anchors is None:
+      anchors = self.anchors()
+    seen = set()
+
+    for orientation in Orientation:
+      template = self.piece.template(orientation)
+      offsets = [(dx, dy) for dx, dy, is_connector in template.docks if is_connector]
+
+      for ax, ay in anchors:
+        for dx, dy in offsets:
+          x2 = ax - dx
+          y2 = ay - dy
+          # connectors on horizontal and vertical edges never meet
+          if x2 % 2 or y2 % 2:
+            continue
+
+          position = (x2 // 2, y2 // 2, orientation)
+          if position in seen:
             continue
+          seen.add(position)
+
+          if board.is_valid_at(template, position[0], position[1]):
+            yield position
+
+  def anchors(self, placed_piece=None):
+    """Return the open connectors inside the board in doubled coordinates.
+
+    Only the connectors of placed_piece are returned if given.
+    """
+    anchors = self.board.anchors
+    if placed_piece is None:
+      return list(anchors)
+
+    return [(x, y) for x, y, c in placed_piece.docks() if (x, y) in anchors]
+
+
+class IncrementalPlacements(object):
+  """Valid placements of a piece, kept up to date while the board fills.
+
+  Placing a piece only invalidates the placements overlapping it, and
+  only enables placements connecting to its open connectors.
+  """
+  def __init__(self, board, piece):
+    self.placements = ValidPlacements(board, piece)
+    self.positions = {}
+    # cell -> positions covering it, may contain stale positions
+    self.covering = defaultdict(set)
+    # per update the removed and added positions, to revert updates
+    self.history = []
+
+    for position in self.placements.positions():
+      self.add(position)
+
+  def __len__(self):
+    return len(self.positions)
+
+  def __iter__(self):
+    return iter(self.positions)
+
+  def add(self, position):
+    x, y, orientation = position
+    self.positions[position] = None
+    for dx, dy in self.placements.piece.template(orientation).cells:
+      self.covering[x + dx, y + dy].add(position)
+
+  def update(self, placed_piece):
+    """Account for placed_piece having been placed on the board."""
+    removed = []
+    for cell in placed_piece.cells():
+      for position in self.covering.pop(cell, ()):
+        if position in self.positions:
+          del self.positions[position]
+          removed.append(position)
+
+    added = []
+    anchors = self.placements.anchors(placed_piece)
+    for position in self.placements.positions(anchors):
+      if position not in self.positions:
+        self.add(position)
+        added.append(position)
+
+    self.history.append((removed, added))
+
+  def revert(self):
+    """Undo the last update, return False if there is none."""
+    if not self.history:
+      return False
+
+    removed, added = self.history.pop()
+    for position in added:
+      del self.positions[position]
+
+    for position in removed:
+      self.add(position)
+
+    return True
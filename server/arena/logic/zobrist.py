@@ -0,0 +1,91 @@
+"""Zobrist hashing of board positions and a shared transposition table.
+
+The hash of a board is the XOR of the keys of all placed pieces, so it can
+be updated incrementally and does not depend on the order of the moves.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+
+from .piece import Orientation
+
+
+MASK64 = (1 << 64) - 1
+ORIENTATIONS = list(Orientation)
+
+
+def splitmix64(value):
+  """Scramble a 64 bit integer, see the SplitMix64 generator."""
+  value = (value + 0x9E3779B97F4A7C15) & MASK64
+  value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+  value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+  return value ^ (value >> 31)
+
+
+@lru_cache(maxsize=1 << 16)
+def zobrist_key(x, y, orientation, shape):
+  """Return the 64 bit key of a piece with shape placed at x, y.
+
+  Keys are derived deterministically instead of drawn from a random
+  table, so they are the same in every process.
+  """
+  width, height, connector_mask = shape
+  key = 0
+  values = [x, y, ORIENTATIONS.index(Orientation(orientation)), width, height]
+  while True:
+    values.append(connector_mask & MASK64)
+    connector_mask >>= 64
+    if not connector_mask:
+      break
+
+  for value in values:
+    key = splitmix64(key ^ (value & MASK64))
+
+  return key
+
+
+def placed_piece_key(placed_piece):
+  return zobrist_key(int(placed_piece.x), int(placed_piece.y),
+                     placed_piece.orientation, placed_piece.piece.shape)
+
+
+class TranspositionTable(object):
+  """A bounded mapping that evicts the least recently used entries.
+
+  Keys are usually built from Board.zobrist, eg (board.zobrist, piece.shape)
+  for the valid placements of a piece.
+  """
+  def __init__(self, maxsize=1 << 16):
+    assert maxsize > 0, 'maxsize must be positive'
+
+    self.maxsize = maxsize
+    self.entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __contains__(self, key):
+    return key in self.entries
+
+  def get(self, key, default=None):
+    try:
+      value = self.entries[key]
+    except KeyError:
+      self.misses += 1
+      return default
+
+    self.entries.move_to_end(key)
+    self.hits += 1
+    return value
+
+  def put(self, key, value):
+    self.entries[key] = value
+    self.entries.move_to_end(key)
+
+    if len(self.entries) > self.maxsize:
+      self.entries.popitem(last=False)
+
+  def clear(self):
+    self.entries.clear()
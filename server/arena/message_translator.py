@@ -1,22 +1,27 @@
 from .logic.piece import Orientation
 from .events import *
-from net.server import MessageReceivedEvent
+from net.server import ClientDisconnectedEvent, MessageReceivedEvent
 
 
 class MessageTranslator(object):
-  """Translates MessageReceivedEvents into more specific events"""
+  """Translates MessageReceivedEvents and ClientDisconnectedEvents into more specific events"""
 
   def __call__(self, event):
     """This method receives the bootstrap event"""
     event.event_queue.register(MessageReceivedEvent, self.onMessageReceived)
+    event.event_queue.register(ClientDisconnectedEvent, self.onClientDisconnected)
 
   async def onMessageReceived(self, event):
     player_id = event.id
-    content = event.content
+    content = event.json
 
     translation = self.translate(content, player_id)
     await event.event_queue.publish(translation)
 
+  async def onClientDisconnected(self, event):
+    # handled after the client's messages, in their shard
+    await event.event_queue.publish(PlayerLeftEvent(event.id))
+
   def translate(self, content, player_id):
     message_type = content['type']
 
@@ -0,0 +1,174 @@
+"""Replay of event journals written by the server with --journal.
+
+The events of all clients are fed to a fresh Lobby, Referee and
+MessageTranslator as fast as they are handled, which reconstructs the
+games of a journal or checks how changed rules would have played out.
+Games start with the players and pieces the server drew for them, as
+recorded in the journal. A journal appended to by several runs of the
+server is replayed run by run:
+
+  python -m arena.replay tushan.journal
+"""
+
+import argparse
+import asyncio as aio
+import json
+import sys
+import time
+
+from collections import Counter
+
+from eventing.event_queue import Event, EventQueue, HandlerFailedEvent
+from eventing.journal import JournalError, read_journal
+from net.codec import journal_codec
+from .events import *
+from .lobby import Lobby, Referee
+from .message_translator import MessageTranslator
+
+
+class ReplayStartedEvent(Event):
+  """Lets the Lobby, Referee and MessageTranslator register themselves"""
+  __slots__ = ()
+
+
+class JournaledLobby(Lobby):
+  """Starts the games recorded in a journal instead of drawing its own."""
+  def launch_game(self, event):
+    pass
+
+
+class Replay(object):
+  """Feeds client events to a Lobby, one after another.
+
+  Each event is handled completely, including all events published in
+  reply, before the next one is fed. Games start as recorded, and the
+  server handles the events of each client in order, so this reproduces
+  the server unless it handled the events of different clients in another
+  order than it journaled them. With --workers the games were started by
+  the one Lobby of the front process as well.
+  """
+  def __init__(self, settings):
+    self.stats = Counter()
+    self.results = []
+    self.games = []
+    self.failures = []
+    self.prepare(settings)
+
+  def prepare(self, settings):
+    """Set up a fresh Lobby, Referee and MessageTranslator for a server run."""
+    self.lobby = JournaledLobby.from_settings(settings)
+    self.event_queue = EventQueue()
+    self.event_queue.register(ReplayStartedEvent, self.lobby)
+    self.event_queue.register(ReplayStartedEvent, Referee())
+    self.event_queue.register(ReplayStartedEvent, MessageTranslator())
+    self.event_queue.register(GameStartedEvent, self.game_started)
+    self.event_queue.register(MoveAcceptedEvent, self.count)
+    self.event_queue.register(GameCancelledEvent, self.count)
+    self.event_queue.register(GameEndedEvent, self.game_ended)
+    self.event_queue.register(HandlerFailedEvent, self.failures.append)
+
+  def count(self, event):
+    self.stats[type(event).__name__] += 1
+
+  def game_started(self, event):
+    self.count(event)
+    self.games.append([str(player.id) for player in event.game.players])
+
+  def game_ended(self, event):
+    self.count(event)
+    self.results.append({
+      'winner': None if event.winner is None else str(event.winner.id),
+      'scores': {str(player.id): score for player, score in event.scores.items()},
+    })
+
+  async def start(self):
+    self.task = aio.create_task(self.event_queue.run())
+    await self.event_queue.publish(ReplayStartedEvent())
+    await self.event_queue.join()
+    self.stats['runs'] += 1
+
+  async def restart(self, settings):
+    """Continue with the next server run, which started without clients or games."""
+    await self.stop()
+    self.prepare(settings)
+    await self.start()
+
+  async def feed(self, event):
+    """Handle event and everything published in reply to it."""
+    await self.event_queue.publish(event)
+    await self.event_queue.join()
+    self.stats['fed'] += 1
+
+  async def stop(self):
+    self.task.cancel()
+    await aio.gather(self.task, return_exceptions=True)
+
+  def summary(self):
+    return {
+      'runs': self.stats['runs'],
+      'events': self.stats['fed'],
+      'games_started': self.stats['GameStartedEvent'],
+      'moves': self.stats['MoveAcceptedEvent'],
+      'games_ended': self.stats['GameEndedEvent'],
+      'games_cancelled': self.stats['GameCancelledEvent'],
+      'handler_failures': len(self.failures),
+      'games': self.games,
+      'results': self.results,
+    }
+
+
+async def replay_journal(path):
+  """Replay the journal at path, return the Replay and its journal's span in seconds."""
+  entries = read_journal(path, journal_codec())
+  try:
+    first, settings = next(entries)
+  except StopIteration:
+    raise JournalError('Journal is empty')
+
+  if not isinstance(settings, dict):
+    raise JournalError('Journal does not start with settings')
+
+  replay = Replay(settings)
+  await replay.start()
+  last = first
+  try:
+    for last, event in entries:
+      if isinstance(event, dict):
+        # settings of a restarted server appending to the journal
+        await replay.restart(event)
+      else:
+        await replay.feed(event)
+  finally:
+    await replay.stop()
+
+  return replay, (last - first) / 1e9
+
+
+class ReplayTool(object):
+  def create_argparser(self):
+    parser = argparse.ArgumentParser(description='Tushan journal replay')
+    parser.add_argument('journal')
+
+    return parser
+
+  def run(self):
+    options = self.create_argparser().parse_args()
+
+    start = time.perf_counter()
+    try:
+      replay, span = aio.run(replay_journal(options.journal))
+    except JournalError as e:
+      print('ERROR:', e, file=sys.stderr)
+      return 1
+    elapsed = time.perf_counter() - start
+
+    summary = replay.summary()
+    summary['seconds'] = elapsed
+    summary['journal_seconds'] = span
+    summary['events_per_second'] = summary['events'] / elapsed if elapsed else 0.0
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+  sys.exit(ReplayTool().run())
@@ -0,0 +1,197 @@
+"""Headless self-play of complete games between bot policies.
+
+Games run directly on arena.logic, without sockets or an EventQueue, and
+can be spread over a pool of processes:
+
+  python -m arena.selfplay --games 1000 --workers 4 random greedy
+"""
+
+import argparse
+import json
+import random
+import time
+
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .logic.game import Board, Game, Player
+from .logic.piece import Piece
+
+
+class RandomPolicy(object):
+  """Plays a uniformly chosen valid placement."""
+  def __call__(self, game, rng):
+    placements = list(game.board.valid_placements(game.current_piece))
+    if not placements:
+      return None
+
+    p = rng.choice(placements)
+    return p.x, p.y, p.orientation
+
+
+class FirstLegalPolicy(object):
+  """Plays the first valid placement found."""
+  def __call__(self, game, rng):
+    p = next(game.board.valid_placements(game.current_piece), None)
+    if p is None:
+      return None
+
+    return p.x, p.y, p.orientation
+
+
+class GreedyPolicy(object):
+  """Plays the placement with the best score lead after the move."""
+  def __call__(self, game, rng):
+    board = game.board
+    player = game.current_player
+    best_lead = None
+    best = []
+
+    for p in board.valid_placements(game.current_piece):
+      sides = Counter(board.connectors)
+      for x, y, is_connector in p.docks():
+        side = board.side_of(x, y)
+        if is_connector and side is not None:
+          sides[side] += 1
+
+      scores = {q: sides[q.objectives[0]] * sides[q.objectives[1]] for q in game.players}
+      lead = scores[player] - max(s for q, s in scores.items() if q is not player)
+
+      if best_lead is None or lead > best_lead:
+        best_lead = lead
+        best = []
+      if lead == best_lead:
+        best.append((p.x, p.y, p.orientation))
+
+    return rng.choice(best) if best else None
+
+
+POLICIES = {
+  'random': RandomPolicy,
+  'first': FirstLegalPolicy,
+  'greedy': GreedyPolicy,
+}
+
+
+GameResult = namedtuple('GameResult', ['seed', 'moves', 'scores', 'winner', 'duration'])
+GameResult.__doc__ = """Outcome of one game.
+
+moves are the (x, y, orientation value) of all turns, scores are given
+per seat and winner is the winning seat or None on a draw.
+"""
+
+
+def game_seed(seed, index):
+  """Return the seed of the index-th game of a run."""
+  return seed * 1000003 + index
+
+
+def play_game(seed, policy_names, board_size=18):
+  """Play one game between the policies, seated in the given order."""
+  rng = random.Random(seed)
+  policies = [POLICIES[name]() for name in policy_names]
+
+  objectives = [
+    [Board.Side.North, Board.Side.South],
+    [Board.Side.West, Board.Side.East],
+  ]
+  players = [Player(seat, objectives[seat % 2]) for seat in range(len(policies))]
+
+  pieces = Piece.official_pieces()
+  rng.shuffle(pieces)
+
+  start = time.perf_counter()
+  game = Game(Board(board_size, incremental=True), players, pieces)
+  moves = []
+
+  while not game.is_over():
+    policy = policies[game.current_player.id]
+    move = policy(game, rng)
+    if move is None:
+      break
+
+    game.push_move(*move)
+    x, y, orientation = move
+    moves.append((x, y, orientation.value))
+
+  winner, scores = game.winner()
+  return GameResult(
+    seed,
+    moves,
+    [scores[player] for player in players],
+    None if winner is None else winner.id,
+    time.perf_counter() - start
+  )
+
+
+def play_games(seeds, policy_names, board_size):
+  return [play_game(seed, policy_names, board_size) for seed in seeds]
+
+
+def run_games(count, policy_names, *, seed=0, board_size=18, workers=1, chunk_size=16):
+  """Play count games and return their GameResults in order.
+
+  Games are distributed over workers processes in chunks, each game is
+  seeded deterministically from seed and its index.
+  """
+  seeds = [game_seed(seed, index) for index in range(count)]
+  if workers <= 1:
+    return play_games(seeds, policy_names, board_size)
+
+  chunks = [seeds[n:n + chunk_size] for n in range(0, count, chunk_size)]
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    futures = [executor.submit(play_games, chunk, policy_names, board_size) for chunk in chunks]
+    return [result for future in futures for result in future.result()]
+
+
+def summarize(results, elapsed):
+  """Return throughput and outcome statistics of a run as a dict."""
+  moves = sum(len(r.moves) for r in results)
+  outcomes = Counter('draw' if r.winner is None else r.winner for r in results)
+  seats = len(results[0].scores) if results else 0
+
+  return {
+    'games': len(results),
+    'moves': moves,
+    'seconds': elapsed,
+    'games_per_second': len(results) / elapsed if elapsed else 0.0,
+    'moves_per_second': moves / elapsed if elapsed else 0.0,
+    'wins': [outcomes[seat] for seat in range(seats)],
+    'draws': outcomes['draw'],
+    'mean_scores': [sum(r.scores[seat] for r in results) / len(results) for seat in range(seats)],
+    'mean_moves': moves / len(results) if results else 0.0,
+  }
+
+
+class SelfPlay(object):
+  def create_argparser(self):
+    parser = argparse.ArgumentParser(description='Tushan headless self-play')
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('-w', '--workers', type=int, default=1)
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('--board-size', type=int, default=18)
+    parser.add_argument('-o', '--output', help='write one JSON line per game')
+    parser.add_argument('policies', nargs=2, choices=sorted(POLICIES))
+
+    return parser
+
+  def run(self):
+    options = self.create_argparser().parse_args()
+
+    start = time.perf_counter()
+    results = run_games(options.games, options.policies,
+                        seed=options.seed,
+                        board_size=options.board_size,
+                        workers=options.workers)
+    elapsed = time.perf_counter() - start
+
+    if options.output:
+      with open(options.output, 'w') as output:
+        for result in results:
+          output.write(json.dumps(result._asdict()) + '\n')
+
+    print(json.dumps(summarize(results, elapsed), indent=2))
+
+
+if __name__ == '__main__':
+  SelfPlay().run()
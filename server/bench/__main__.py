@@ -0,0 +1,324 @@
+"""Benchmarks of the rules engine, serialization and event dispatch.
+
+  python -m bench                     run all benchmarks and print results
+  python -m bench -o results.json     also write the results as JSON
+  python -m bench --save-baseline     store the results as the baseline
+  python -m bench --compare           flag regressions against the baseline
+
+Positions are generated with fixed seeds, and parameters such as the
+board size and the number of running games are scaled to show how
+costs grow rather than a single data point.
+"""
+
+import argparse
+import asyncio as aio
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+
+from arena.events import MoveAcceptedEvent
+from arena.logic.game import InvalidPlacementError
+from arena.logic.piece import Orientation, PlacedPiece
+from arena.serializers import GameSerializer
+from eventing.event_queue import EventQueue
+from net.server import Broadcaster, ClientConnectedEvent, MessageReceivedEvent
+
+from .fixtures import STAGES, FakeWriter, build_game, build_large_game, build_lobby_game
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+BENCHMARKS = {}
+
+
+def benchmark(**grid):
+  """Register a benchmark, run once per combination of the grid's values.
+
+  The decorated generator receives one value per grid key and yields a
+  callable to time along with the number of operations per call once.
+  Code after the yield tears the benchmark down.
+  """
+  def register(function):
+    BENCHMARKS[function.__name__] = (function, grid)
+    return function
+  return register
+
+
+def random_candidates(game, count=200, seed=1):
+  rng = random.Random(seed)
+  size = game.board.size
+  return [PlacedPiece(game.current_piece,
+                      rng.randrange(size + 1),
+                      rng.randrange(size + 1),
+                      rng.choice(list(Orientation)),
+                      None)
+          for _ in range(count)]
+
+
+@benchmark(stage=list(STAGES), size=[10, 18, 34])
+def validate_placement(stage, size):
+  game = build_game(stage, size)
+  candidates = random_candidates(game)
+
+  def run():
+    for candidate in candidates:
+      try:
+        game.board.validate_placement(candidate)
+      except InvalidPlacementError:
+        pass
+
+  yield run, len(candidates)
+
+
+@benchmark(stage=list(STAGES), size=[10, 18, 34])
+def valid_placements(stage, size):
+  game = build_game(stage, size)
+  yield lambda: list(game.board.valid_placements(game.current_piece)), 1
+
+
+@benchmark(stage=list(STAGES), size=[10, 18, 34])
+def has_valid_placement(stage, size):
+  game = build_game(stage, size)
+  yield lambda: game.board.has_valid_placement(game.current_piece), 1
+
+
+@benchmark(stage=list(STAGES))
+def scores(stage):
+  game = build_game(stage)
+  yield game.scores, 1
+
+
+@benchmark(stage=list(STAGES))
+def serialize(stage):
+  game = build_game(stage)
+  yield lambda: json.dumps(GameSerializer.serialize(game)), 1
+
+
+@benchmark(games=[1, 10, 50])
+def dispatch(games, events=100):
+  """Broadcast accepted moves of running games to their players."""
+  games = [build_game('mid', first_player=2 * n) for n in range(games)]
+  loop = aio.new_event_loop()
+  event_queue = EventQueue()
+  broadcaster = Broadcaster()
+  event_queue.register_class(broadcaster)
+  task = loop.create_task(event_queue.run())
+
+  async def connect():
+    for n in range(2 * len(games)):
+      await event_queue.publish(ClientConnectedEvent(n, None, FakeWriter()))
+    await event_queue.join()
+
+  async def broadcast():
+    for n in range(events):
+      game = games[n % len(games)]
+      event = MoveAcceptedEvent(game, game.board.pieces[-1], game.current_piece)
+      await event_queue.publish(event)
+    await event_queue.join()
+    # until every client's writer task sent everything
+    while any(outbox.messages for outbox in broadcaster.clients.values()):
+      await aio.sleep(0)
+
+  try:
+    loop.run_until_complete(connect())
+    yield lambda: loop.run_until_complete(broadcast()), events
+  finally:
+    outboxes = [outbox.task for outbox in broadcaster.clients.values()]
+    broadcaster.close()
+    task.cancel()
+    loop.run_until_complete(aio.gather(task, *outboxes, return_exceptions=True))
+    loop.close()
+
+
+@benchmark(handlers=[1, 4])
+def events(handlers, events=1000):
+  """Create, publish and dispatch client messages to handlers using their queue."""
+  loop = aio.new_event_loop()
+  event_queue = EventQueue()
+  for _ in range(handlers):
+    event_queue.register(MessageReceivedEvent, lambda event: event.event_queue)
+  task = loop.create_task(event_queue.run())
+
+  async def publish():
+    for n in range(events):
+      await event_queue.publish(MessageReceivedEvent(n, None))
+    await event_queue.join()
+
+  try:
+    yield lambda: loop.run_until_complete(publish()), events
+  finally:
+    task.cancel()
+    loop.run_until_complete(aio.gather(task, return_exceptions=True))
+    loop.close()
+
+
+@benchmark(size=[128, 512], placed=[50, 200, 800])
+def scale_validate_placement(size, placed):
+  game = build_large_game(size, placed)
+  candidates = random_candidates(game)
+  # candidates next to placed pieces, which pass the cheap checks
+  candidates += [PlacedPiece(game.current_piece, p.x, p.y, p.orientation, None)
+                 for p in game.board.pieces[-50:]]
+
+  def run():
+    for candidate in candidates:
+      try:
+        game.board.validate_placement(candidate)
+      except InvalidPlacementError:
+        pass
+
+  yield run, len(candidates)
+
+
+@benchmark(size=[128, 512], placed=[50, 200, 800], incremental=[False, True])
+def scale_valid_placements(size, placed, incremental):
+  game = build_large_game(size, placed, incremental=incremental)
+  piece = game.current_piece
+  yield lambda: list(game.board.valid_placements(piece)), 1
+
+
+@benchmark(size=[128, 512], placed=[50, 200, 800])
+def scale_turn(size, placed):
+  """A turn on an incremental board: place a piece, check for moves, undo."""
+  game = build_large_game(size, placed + 1, incremental=True)
+  x, y, orientation = game.snapshot().moves[-1]
+  game.pop_move()
+  game.board.has_valid_placement(game.pieces[1])
+
+  def run():
+    game.push_move(x, y, orientation)
+    game.is_over()
+    game.pop_move()
+
+  yield run, 1
+
+
+@benchmark(pieces=[50, 200, 800])
+def scale_pieces(pieces):
+  """A server turn with generated pieces: place one, check for moves, undo."""
+  game = build_lobby_game(128, pieces)
+  placement = next(game.board.valid_placements(game.current_piece))
+
+  def run():
+    game.push_move(placement.x, placement.y, placement.orientation)
+    game.is_over()
+    game.pop_move()
+
+  yield run, 1
+
+
+@benchmark(size=[128, 512], placed=[50, 200, 800])
+def scale_scores(size, placed):
+  game = build_large_game(size, placed)
+  yield game.scores, 1
+
+
+def benchmark_runs(names=None):
+  """Generate (key, function, parameters) of all benchmark runs."""
+  for name, (function, grid) in BENCHMARKS.items():
+    if names and name not in names:
+      continue
+
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+      params = dict(zip(keys, values))
+      label = ','.join(f'{k}={v}' for k, v in params.items())
+      yield f'{name}[{label}]', function, params
+
+
+def run_benchmarks(names=None, repeat=5, min_time=0.2):
+  """Time all benchmarks, return a dict from run key to result."""
+  results = {}
+  for key, function, params in benchmark_runs(names):
+    setup = function(**params)
+    run, ops = next(setup)
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    setup.close()
+
+    results[key] = {
+      'params': params,
+      'seconds_per_op': best / number / ops,
+      'ops_per_second': number * ops / best,
+    }
+    print(f'{key:50} {results[key]["seconds_per_op"] * 1e6:12.2f} us/op', file=sys.stderr)
+
+  return results
+
+
+def compare(results, baseline, threshold):
+  """Return the keys of results slower than baseline by more than threshold."""
+  regressions = []
+  for key, result in results.items():
+    if key not in baseline:
+      continue
+
+    ratio = result['seconds_per_op'] / baseline[key]['seconds_per_op']
+    result['baseline_ratio'] = ratio
+    if ratio > threshold:
+      regressions.append(key)
+
+  return regressions
+
+
+class Bench(object):
+  def create_argparser(self):
+    parser = argparse.ArgumentParser(description='Tushan benchmarks')
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='approximate seconds per timing repetition')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as regression')
+    parser.add_argument('benchmarks', nargs='*',
+                        help='names of benchmarks to run: ' + ', '.join(BENCHMARKS))
+
+    return parser
+
+  def run(self):
+    argparser = self.create_argparser()
+    options = argparser.parse_args()
+    unknown = set(options.benchmarks) - set(BENCHMARKS)
+    if unknown:
+      argparser.error('unknown benchmarks: ' + ', '.join(sorted(unknown)))
+
+    results = run_benchmarks(options.benchmarks, options.repeat, options.min_time)
+
+    regressions = []
+    if options.compare:
+      with open(options.baseline) as baseline:
+        regressions = compare(results, json.load(baseline)['results'], options.threshold)
+
+      for key in regressions:
+        ratio = results[key]['baseline_ratio']
+        print(f'REGRESSION {key}: {ratio:.2f}x slower than baseline', file=sys.stderr)
+
+    report = {
+      'python': platform.python_version(),
+      'machine': platform.machine(),
+      'results': results,
+      'regressions': regressions,
+    }
+
+    if options.output:
+      with open(options.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+    if options.save_baseline:
+      with open(options.baseline, 'w') as output:
+        json.dump(report, output, indent=2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+  sys.exit(Bench().run())
@@ -0,0 +1,105 @@
+"""Reproducible game positions to benchmark against."""
+
+import random
+
+from arena.lobby import Lobby, PlayerProxy
+from arena.logic.game import Board, Game, Player
+from arena.logic.piece import Piece
+from arena.logic.placements import ValidPlacements
+from arena.selfplay import RandomPolicy
+
+
+# number of turns played for each stage of a game
+STAGES = {
+  'early': 2,
+  'mid': 12,
+  'late': 24,
+}
+
+
+def players(first=0):
+  return [
+    Player(first, [Board.Side.North, Board.Side.South]),
+    Player(first + 1, [Board.Side.West, Board.Side.East]),
+  ]
+
+
+def build_game(stage, board_size=18, seed=0, incremental=False, first_player=0):
+  """Return a Game after the turns of stage, played by random policies.
+
+  Its players have the ids first_player and first_player + 1. The game
+  stops earlier if it is over before.
+  """
+  rng = random.Random(seed)
+  pieces = Piece.official_pieces()
+  rng.shuffle(pieces)
+
+  game = Game(Board(board_size, incremental=incremental), players(first_player), pieces)
+  policy = RandomPolicy()
+
+  for _ in range(STAGES[stage]):
+    if game.is_over():
+      break
+
+    game.push_move(*policy(game, rng))
+
+  return game
+
+
+def build_large_game(board_size, placed, seed=0, incremental=False):
+  """Return a Game with placed generated pieces on a large board.
+
+  Every turn plays the first valid placement at randomly ordered open
+  connectors, which keeps building the fixture cheap. Generated pieces
+  without a valid placement are left out of the game.
+  """
+  rng = random.Random(seed)
+  board = Board(board_size)
+  initial_piece = Piece.generated_pieces(1, rng)[0]
+  board.place_initial(initial_piece)
+
+  pieces = [initial_piece]
+  moves = []
+  while len(moves) < placed and board.anchors:
+    piece = Piece.generated_pieces(1, rng)[0]
+    placements = ValidPlacements(board, piece)
+    anchors = placements.anchors()
+    rng.shuffle(anchors)
+
+    position = next(placements.positions(anchors), None)
+    if position is None:
+      continue
+
+    board.place(piece, *position, None)
+    pieces.append(piece)
+    moves.append(position)
+
+  pieces += Piece.generated_pieces(2, rng)
+  game = Game(Board(board_size, incremental=incremental), players(), pieces)
+  for move in moves:
+    game.push_move(*move)
+
+  return game
+
+
+def build_lobby_game(board_size, count, seed=0):
+  """Return a Game of count generated pieces, built like the server's."""
+  rng = random.Random(seed)
+  lobby = Lobby(board_size=board_size, pieces=lambda: Piece.generated_pieces(count, rng), rng=rng)
+  lobby.players = {n: PlayerProxy(n) for n in range(2)}
+  return lobby.build_game()
+
+
+class FakeWriter(object):
+  """Stands in for a client's StreamWriter."""
+  def __init__(self):
+    self.written = 0
+
+  def write(self, data):
+    self.written += len(data)
+
+  async def drain(self):
+    pass
+
+  def close(self):
+    pass
@@ -0,0 +1,46 @@
+"""Transport of events between processes over stream sockets.
+
+Events are framed as journal records, so any Codec for journals also
+serves a Link.
+"""
+
+import asyncio as aio
+
+from .journal import HEADER, record
+
+
+class Link(object):
+  """One end of a stream connecting two processes."""
+  def __init__(self, reader, writer, codec):
+    self.reader = reader
+    self.writer = writer
+    self.codec = codec
+
+  @classmethod
+  async def open(clss, sock, codec):
+    """Create a Link over the connected socket sock."""
+    reader, writer = await aio.open_connection(sock=sock)
+    return clss(reader, writer, codec)
+
+  async def send(self, event):
+    self.writer.write(self.codec.encode(event))
+    await self.writer.drain()
+
+  async def send_record(self, code, payload):
+    self.writer.write(record(code, payload))
+    await self.writer.drain()
+
+  async def records(self):
+    """Generate (code, payload) of received records until the other end closes."""
+    while True:
+      try:
+        header = await self.reader.readexactly(HEADER.size)
+        length, code, _ = HEADER.unpack(header)
+        payload = await self.reader.readexactly(length)
+      except (aio.IncompleteReadError, ConnectionError):
+        return
+
+      yield code, payload
+
+  def close(self):
+    self.writer.close()
@@ -0,0 +1,112 @@
+import asyncio as aio
+
+from collections import Counter, deque
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+  """Lanes of a Channel, more urgent ones are taken first"""
+  Control = 0
+  Normal = 1
+  Bulk = 2
+
+
+class Channel(object):
+  """A bounded queue of events with one FIFO lane per priority.
+
+  get() takes the oldest event of the most urgent lane that is not empty,
+  so control events overtake bulk traffic. Each lane holds at most maxsize
+  events, or any number if maxsize is 0, and put() waits while the lane of
+  an event is full. put(block=False) appends even to a full lane and counts
+  the overflow instead.
+
+  Events with coalesce set are dropped when another event of their class
+  is still queued.
+  """
+  def __init__(self, maxsize=0):
+    self.maxsize = maxsize
+    self.lanes = {priority: deque() for priority in Priority}
+    self.not_empty = aio.Event()
+    self.not_full = {priority: aio.Event() for priority in Priority}
+    self.unfinished = 0
+    self.finished = aio.Event()
+    self.finished.set()
+    # queued events per class with coalesce set
+    self.coalescing = Counter()
+    # published, blocked, overflowed and coalesced events per priority
+    self.stats = Counter()
+
+  def full(self, priority):
+    return self.maxsize > 0 and len(self.lanes[priority]) >= self.maxsize
+
+  def empty(self):
+    return not any(self.lanes.values())
+
+  def qsize(self):
+    return sum(len(lane) for lane in self.lanes.values())
+
+  def depths(self):
+    """Return the number of queued events per priority."""
+    return {priority: len(lane) for priority, lane in self.lanes.items()}
+
+  async def put(self, event, block=True):
+    priority = event.priority
+    if event.coalesce:
+      event_class = type(event)
+      if self.coalescing[event_class]:
+        self.stats['coalesced', priority] += 1
+        return
+
+      self.coalescing[event_class] += 1
+
+    if self.full(priority):
+      if block:
+        self.stats['blocked', priority] += 1
+        while self.full(priority):
+          self.not_full[priority].clear()
+          await self.not_full[priority].wait()
+      else:
+        self.stats['overflowed', priority] += 1
+
+    self.lanes[priority].append(event)
+    self.stats['published', priority] += 1
+    self.unfinished += 1
+    self.finished.clear()
+    self.not_empty.set()
+
+  async def get(self):
+    while True:
+      for priority, lane in self.lanes.items():
+        if lane:
+          return self.take(priority)
+
+      self.not_empty.clear()
+      await self.not_empty.wait()
+
+  def get_similar(self, event):
+    """Return the events of event's class queued right after it was taken."""
+    event_class = type(event)
+    lane = self.lanes[event.priority]
+
+    events = []
+    while lane and type(lane[0]) is event_class:
+      events.append(self.take(event.priority))
+
+    return events
+
+  def take(self, priority):
+    event = self.lanes[priority].popleft()
+    self.not_full[priority].set()
+    if event.coalesce:
+      self.coalescing[type(event)] -= 1
+
+    return event
+
+  def task_done(self):
+    assert self.unfinished > 0
+    self.unfinished -= 1
+    if not self.unfinished:
+      self.finished.set()
+
+  async def join(self):
+    await self.finished.wait()
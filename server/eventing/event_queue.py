@@ -1,62 +1,338 @@
 import asyncio as aio
 import traceback
 
-from collections import defaultdict
-from datetime import datetime
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from time import monotonic_ns, perf_counter
+
+from .channel import Channel, Priority
+
+
+# the queue dispatching to the running handler, set once per consumer task
+current_queue = ContextVar('current_queue', default=None)
 
 
 class Event(object):
+  """Base of all events.
+
+  Subclasses declare __slots__ for their attributes. occured is a
+  time.monotonic_ns() stamp of the event's creation.
+  """
+  __slots__ = ('occured', 'published')
+
+  # attribute a ShardedEventQueue partitions events by,
+  # None for events handled in order in the first shard
+  routed_by = None
+  priority = Priority.Normal
+  # an idempotent event is dropped while another one of its type is queued
+  coalesce = False
+
   def __init__(self):
-    self.occured = datetime.now()
-    self.event_queue = None
+    self.occured = monotonic_ns()
+
+  @property
+  def event_queue(self):
+    """The queue handling this event, while its handlers run."""
+    return current_queue.get()
+
+  @property
+  def routing_key(self):
+    return None if self.routed_by is None else getattr(self, self.routed_by)
 
 
 class HandlerFailedEvent(Event):
-  def __init__(self, failed_handler, exception):
+  __slots__ = ('failed_handler', 'exception', 'event')
+
+  def __init__(self, failed_handler, exception, event=None):
     super().__init__()
     self.failed_handler = failed_handler
     self.exception = exception
+    self.event = event
+
+
+class Dispatch(object):
+  """Times the handlers of one event, which may run in several lanes.
+
+  The dispatch is over once the queue scheduled all handlers and each of
+  them returned, pending counts both.
+  """
+  __slots__ = ('event_class', 'start', 'pending')
+
+  def __init__(self, event_class, handlers):
+    self.event_class = event_class
+    self.start = perf_counter()
+    self.pending = handlers + 1
+
+  def done(self, metrics):
+    self.pending -= 1
+    if self.pending == 0:
+      metrics.dispatched(self.event_class, perf_counter() - self.start)
+
+
+def is_async_handler(handler):
+  """Check if calling handler returns an awaitable coroutine."""
+  return (aio.iscoroutinefunction(handler) or
+          aio.iscoroutinefunction(getattr(handler, '__call__', None)))
 
 
 class EventQueue(object):
-  def __init__(self):
-    self.queue = aio.Queue()
+  """Dispatches published events to the handlers registered for them.
+
+  By default every handler of an event runs to completion before the next
+  handler or event. A concurrent queue instead hands each call to the lane
+  of its handler: calls in one lane run one after another in the order the
+  events were published, while different lanes run concurrently. Handlers
+  registered without a lane share the default lane.
+
+  With a maxsize, at most maxsize events of each priority are queued and
+  publishing waits for space, which pauses eg. the Reader of a flooding
+  client. Lanes of a concurrent queue are bounded by maxsize as well.
+  Handlers publishing to a full queue don't wait, since that could wait
+  for themselves, and the overflow is counted in queue.stats instead.
+
+  Latencies and failures of handlers are recorded in metrics, if given.
+
+  Batch handlers are called once with a list of consecutively queued
+  events of the same class, after each of them went through the handlers
+  for single events.
+  """
+  def __init__(self, concurrent=False, front=None, maxsize=0, metrics=None):
+    """front is the queue handlers publish to, if this is one of its shards."""
+    self.queue = Channel(maxsize)
+    self.concurrent = concurrent
+    self.front = front or self
+    self.metrics = metrics
+    if metrics:
+      metrics.watch(self.queue)
+    # event class -> [(handler, is_async, lane)] in order of registration
     self.handlers = defaultdict(list)
+    self.batch_handlers = defaultdict(list)
+    # concrete event class -> handlers and batch handlers of it and its base classes
+    self.dispatch_table = {}
+    # lane key -> pending (event, handler, is_async, Dispatch or None) calls
+    self.lanes = {}
+    self.lane_tasks = {}
+    self.lane_drained = aio.Event()
+    self.dispatching = None
+
+  def register(self, event_class, handler, lane=None):
+    """Call handler for events of event_class and its subclasses.
+
+    lane is the key of the lane running the handler in a concurrent queue,
+    or a function returning the key for an event, eg. to keep the events
+    of one client in order.
+    """
+    self.handlers[event_class].append((handler, is_async_handler(handler), lane))
+    self.dispatch_table.clear()
 
-  def register(self, event_class, handler):
-    self.handlers[event_class].append(handler)
+  def register_batch(self, event_class, handler, lane=None):
+    """Call handler with lists of queued events of event_class.
+
+    A lane function is called with the first event of a list.
+    """
+    self.batch_handlers[event_class].append((handler, is_async_handler(handler), lane))
+    self.dispatch_table.clear()
+
+  def handlers_for(self, event_class):
+    """Return the handlers and batch handlers for event_class.
+
+    Both are tuples of (handler, is_async, lane), handlers of the most
+    specific class come first. The result is cached until the next
+    registration.
+    """
+    try:
+      return self.dispatch_table[event_class]
+    except KeyError:
+      mro = event_class.__mro__
+      handlers = tuple(h for clss in mro for h in self.handlers.get(clss, ()))
+      batch_handlers = tuple(h for clss in mro for h in self.batch_handlers.get(clss, ()))
+      self.dispatch_table[event_class] = handlers, batch_handlers
+      return handlers, batch_handlers
 
   def register_class(self, clss):
+    """Register clss for its events, as batch handler if clss.batch is set."""
+    lane = getattr(clss, 'lane', None)
+    register = self.register_batch if getattr(clss, 'batch', False) else self.register
     try:
       # can also be a list of events
       for event_class in clss.events:
-        self.register(event_class, clss)
+        register(event_class, clss, lane)
     except TypeError:
-      self.register(clss.events, clss)
+      register(clss.events, clss, lane)
 
   async def publish(self, event):
-    await self.queue.put(event)
+    if self.metrics:
+      event.published = perf_counter()
+    # handlers must not wait for queue space
+    await self.queue.put(event, block=current_queue.get() is None)
+
+  async def join(self):
+    """Wait until all published events have been handled."""
+    while True:
+      await self.queue.join()
+      if self.lane_tasks:
+        # handlers still running may publish further events
+        await aio.wait(list(self.lane_tasks.values()))
+      elif self.queue.empty():
+        return
 
   async def run(self):
+    # inherited by the tasks of lanes
+    current_queue.set(self.front)
+
     while True:
       event = await self.queue.get()
-      event.event_queue = self
+      handlers, batch_handlers = self.handlers_for(type(event))
 
-      event_class = type(event)
-      for handler in self.handlers[event_class]:
-        await self.fire_event(event, handler)
+      events = [event]
+      if batch_handlers:
+        events += self.queue.get_similar(event)
 
-      self.queue.task_done()
+      for event in events:
+        self.dispatching = event
+        timing = self.metrics and self.start_timing(event, len(handlers))
 
-  async def fire_event(self, event, handler):
-      event_class = type(event)
-      try:
-        result = handler(event)
+        for handler, is_async, lane in handlers:
+          await self.dispatch(event, event, handler, is_async, lane, timing)
+
+        if timing:
+          timing.done(self.metrics)
+
+      for handler, is_async, lane in batch_handlers:
+        await self.dispatch(events[0], events, handler, is_async, lane)
+
+      self.dispatching = None
+      for _ in events:
+        self.queue.task_done()
+
+  def start_timing(self, event, handlers):
+    """Record how long event waited, return the Dispatch timing its handlers."""
+    # events put into the queue by other means carry no stamp
+    published = getattr(event, 'published', None)
+    if published is not None:
+      self.metrics.waited(type(event), perf_counter() - published)
+    return Dispatch(type(event), handlers)
+
+  async def dispatch(self, event, argument, handler, is_async, lane, timing=None):
+    """Call handler with argument now or in its lane."""
+    if self.concurrent:
+      key = lane(event) if callable(lane) else lane
+      await self.schedule(key, argument, handler, is_async, timing)
+    else:
+      await self.fire_event(argument, handler, is_async)
+      if timing:
+        timing.done(self.metrics)
+
+  def is_idle(self):
+    """Check if no events are waiting or being handled."""
+    return self.queue.empty() and self.dispatching is None and not self.lane_tasks
+
+  async def schedule(self, key, event, handler, is_async, timing=None):
+    """Queue a handler call in the lane of key, starting it if idle."""
+    maxsize = self.queue.maxsize
+    while maxsize and len(self.lanes.get(key, ())) >= maxsize:
+      self.lane_drained.clear()
+      await self.lane_drained.wait()
 
-        # event handler may be async
-        if aio.iscoroutine(result):
-          await result
+    calls = self.lanes.get(key)
+    if calls is None:
+      calls = self.lanes[key] = deque()
+      self.lane_tasks[key] = aio.create_task(self.run_lane(key, calls))
+
+    calls.append((event, handler, is_async, timing))
+
+  async def run_lane(self, key, calls):
+    try:
+      while calls:
+        event, handler, is_async, timing = calls.popleft()
+        self.lane_drained.set()
+        await self.fire_event(event, handler, is_async)
+        if timing:
+          timing.done(self.metrics)
+    finally:
+      # idle lanes are dropped so per client lanes don't pile up
+      del self.lanes[key]
+      del self.lane_tasks[key]
+
+  def cancel(self):
+    """Cancel the handler calls still running in lanes."""
+    for task in self.lane_tasks.values():
+      task.cancel()
+
+  async def fire_event(self, event, handler, is_async):
+      start = perf_counter()
+      try:
+        if is_async:
+          await handler(event)
+        else:
+          result = handler(event)
+          # eg. a lambda or partial wrapping an async handler
+          if aio.iscoroutine(result):
+            await result
       except Exception as e:
+        self.handled(event, handler, start, True)
         if aio.get_event_loop().get_debug():
           traceback.print_exc()
-        await self.publish(HandlerFailedEvent(handler, e))
+        # a failing failure handler would otherwise fail again and again
+        if not isinstance(event, HandlerFailedEvent):
+          await self.front.publish(HandlerFailedEvent(handler, e, event))
+      else:
+        self.handled(event, handler, start, False)
+
+  def handled(self, event, handler, start, failed):
+    if self.metrics:
+      # batch handlers get a list of events of one class
+      event_class = type(event[0] if isinstance(event, list) else event)
+      self.metrics.handled(event_class, handler, perf_counter() - start, failed)
+
+
+class ShardedEventQueue(object):
+  """Partitions events over several EventQueues by their routing key.
+
+  Every shard has its own consumer, so a handler waiting on the events of
+  one client doesn't hold up the others. Events with the same key always
+  go to the same shard and are handled in order. Events without a key all
+  go through the first shard and are handled in the order they were
+  published, as in a single EventQueue. State shared between shards, like
+  the Lobby, must only be touched by events without a key.
+  Handlers are registered with every shard.
+
+  In the server only the messages of clients and their disconnects have a
+  key, so the shards spread their parsing and translation. Games are judged in the first
+  shard, or in worker processes, see net.workers.
+  """
+  def __init__(self, shards, concurrent=False, maxsize=0, metrics=None):
+    assert shards > 0
+    self.shards = [EventQueue(concurrent, self, maxsize, metrics) for _ in range(shards)]
+
+  def register(self, event_class, handler, lane=None):
+    for shard in self.shards:
+      shard.register(event_class, handler, lane)
+
+  def register_class(self, clss):
+    for shard in self.shards:
+      shard.register_class(clss)
+
+  def shard_for(self, event):
+    key = event.routing_key
+    if key is None:
+      return self.shards[0]
+
+    return self.shards[hash(key) % len(self.shards)]
+
+  async def publish(self, event):
+    await self.shard_for(event).publish(event)
+
+  async def join(self):
+    """Wait until all published events have been handled."""
+    # handlers may publish to shards that were already joined
+    while not all(shard.is_idle() for shard in self.shards):
+      for shard in self.shards:
+        await shard.join()
+
+  async def run(self):
+    await aio.gather(*(shard.run() for shard in self.shards))
+
+  def cancel(self):
+    for shard in self.shards:
+      shard.cancel()
@@ -0,0 +1,168 @@
+"""Append-only binary log of events.
+
+A journal is a sequence of records, each a header of payload length, type
+code and wall clock nanoseconds followed by the payload. A Codec maps
+event classes to type codes and payloads, type code 0 holds metadata as
+JSON, eg. the configuration needed to replay the journal.
+"""
+
+import asyncio as aio
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+HEADER = struct.Struct('<IHq')
+META = 0
+
+
+class JournalError(Exception):
+  pass
+
+
+class Codec(object):
+  """Encodes events into records and decodes them back."""
+  def __init__(self):
+    # type code -> (event class, decode)
+    self.decoders = {}
+    # event class -> (type code, encode)
+    self.encoders = {}
+
+  def register(self, code, event_class, encode, decode):
+    """Encode events of event_class with encode(event) -> bytes.
+
+    decode(payload) -> event is called with a memoryview of the payload.
+    """
+    assert code != META and code not in self.decoders
+    self.decoders[code] = (event_class, decode)
+    self.encoders[event_class] = (code, encode)
+
+  @property
+  def events(self):
+    return list(self.encoders)
+
+  def encode(self, event, timestamp=None):
+    code, encode = self.encoders[type(event)]
+    return record(code, encode(event), timestamp)
+
+  def decode(self, code, payload):
+    if code == META:
+      return json.loads(bytes(payload))
+
+    try:
+      event_class, decode = self.decoders[code]
+    except KeyError:
+      raise JournalError(f'Unknown record type {code}')
+
+    return decode(payload)
+
+
+def record(code, payload, timestamp=None):
+  if timestamp is None:
+    timestamp = time.time_ns()
+
+  return HEADER.pack(len(payload), code, timestamp) + payload
+
+
+def meta_record(meta):
+  return record(META, json.dumps(meta, separators=(',', ':')).encode('utf-8'))
+
+
+def records(buffer):
+  """Generate (code, timestamp, payload) of the records in buffer.
+
+  Payloads are memoryviews into buffer, valid until the next record. A
+  truncated last record, as left by a crash while writing, ends the
+  journal.
+  """
+  view = memoryview(buffer)
+  offset = 0
+  end = len(view)
+
+  try:
+    while offset + HEADER.size <= end:
+      length, code, timestamp = HEADER.unpack_from(view, offset)
+      offset += HEADER.size
+      if offset + length > end:
+        break
+
+      with view[offset:offset + length] as payload:
+        yield code, timestamp, payload
+      offset += length
+  finally:
+    view.release()
+
+
+def read_journal(path, codec):
+  """Generate (timestamp, event or metadata dict) of the journal at path."""
+  with open(path, 'rb') as journal:
+    if not os.fstat(journal.fileno()).st_size:
+      return
+
+    with mmap.mmap(journal.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+      entries = records(buffer)
+      try:
+        for code, timestamp, payload in entries:
+          yield timestamp, codec.decode(code, payload)
+      finally:
+        # releases the views before the map is closed
+        entries.close()
+
+
+class Journal(object):
+  """Appends the events it handles to a journal file.
+
+  Handling an event only encodes it into a buffer. run() writes what was
+  buffered and fsyncs it in an executor, all records buffered meanwhile
+  are committed together with the next write.
+
+  An existing journal is appended to, after a new metadata record if
+  meta is given, so readers can tell the runs writing it apart.
+  """
+  def __init__(self, path, codec, meta=None):
+    self.codec = codec
+    self.events = codec.events
+    self.file = open(path, 'ab')
+    self.buffer = bytearray()
+    self.pending = aio.Event()
+    # close() may commit while a cancelled run() still writes
+    self.lock = threading.Lock()
+    self.commits = 0
+    if meta is not None:
+      self.append(meta_record(meta))
+
+  def __call__(self, event):
+    self.append(self.codec.encode(event))
+
+  def append(self, data):
+    self.buffer += data
+    self.pending.set()
+
+  async def run(self):
+    loop = aio.get_running_loop()
+    while True:
+      await self.pending.wait()
+      await loop.run_in_executor(None, self.commit, self.take())
+
+  def take(self):
+    data = bytes(self.buffer)
+    self.buffer.clear()
+    self.pending.clear()
+    return data
+
+  def commit(self, data):
+    with self.lock:
+      self.file.write(data)
+      self.file.flush()
+      os.fsync(self.file.fileno())
+      self.commits += 1
+
+  def close(self):
+    """Commit what is still buffered and close the file."""
+    if self.buffer:
+      self.commit(self.take())
+    with self.lock:
+      self.file.close()
@@ -0,0 +1,183 @@
+"""Instrumentation of EventQueues in Prometheus text exposition format.
+
+  metrics = Metrics()
+  event_queue = EventQueue(metrics=metrics)
+  await MetricsServer(metrics, '127.0.0.1', 9100).start()
+
+The server answers every request with the current metrics.
+"""
+
+import asyncio as aio
+
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+
+# upper bounds in seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram(object):
+  """Counts observations in buckets of upper bounds."""
+  def __init__(self, buckets=DEFAULT_BUCKETS):
+    self.buckets = buckets
+    # last count is for observations above all bounds
+    self.counts = [0] * (len(buckets) + 1)
+    self.sum = 0.0
+    self.count = 0
+
+  def observe(self, value):
+    self.counts[bisect_left(self.buckets, value)] += 1
+    self.sum += value
+    self.count += 1
+
+  def samples(self):
+    """Generate (le, cumulative count) of all buckets."""
+    cumulative = 0
+    for bound, count in zip(self.buckets, self.counts):
+      cumulative += count
+      yield repr(bound), cumulative
+
+    yield '+Inf', self.count
+
+
+def label_value(value):
+  return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def labels(**values):
+  if not values:
+    return ''
+
+  pairs = ','.join(f'{name}="{label_value(value)}"' for name, value in values.items())
+  return '{' + pairs + '}'
+
+
+def handler_name(handler):
+  try:
+    return handler.__qualname__
+  except AttributeError:
+    return type(handler).__qualname__
+
+
+class Metrics(object):
+  """Latencies, failures and queue depths of one or more EventQueues."""
+  def __init__(self, buckets=DEFAULT_BUCKETS):
+    self.buckets = buckets
+    # (event class name, handler name) -> Histogram
+    self.handler_seconds = defaultdict(self.histogram)
+    # event class name -> Histogram
+    self.dispatch_seconds = defaultdict(self.histogram)
+    self.queue_wait_seconds = defaultdict(self.histogram)
+    self.handler_failures = Counter()
+    self.channels = []
+    self.handler_names = {}
+    # (name, type, help, collect) of metrics reported by other components
+    self.collectors = []
+
+  def histogram(self):
+    return Histogram(self.buckets)
+
+  def watch(self, channel):
+    """Report the depth and stats of channel."""
+    self.channels.append(channel)
+
+  def collect(self, name, type, help, collect):
+    """Report a gauge or counter, collect() generates its (labels, value)."""
+    self.collectors.append((name, type, help, collect))
+
+  def name_of(self, handler):
+    try:
+      return self.handler_names[handler]
+    except KeyError:
+      name = self.handler_names[handler] = handler_name(handler)
+      return name
+
+  def handled(self, event_class, handler, seconds, failed):
+    handler = self.name_of(handler)
+    self.handler_seconds[event_class.__name__, handler].observe(seconds)
+    if failed:
+      self.handler_failures[handler] += 1
+
+  def waited(self, event_class, seconds):
+    self.queue_wait_seconds[event_class.__name__].observe(seconds)
+
+  def dispatched(self, event_class, seconds):
+    self.dispatch_seconds[event_class.__name__].observe(seconds)
+
+  def render(self):
+    """Return all metrics in Prometheus text exposition format."""
+    lines = []
+
+    def histograms(name, help, histograms, label_names):
+      lines.append(f'# HELP {name} {help}')
+      lines.append(f'# TYPE {name} histogram')
+      for key, histogram in sorted(histograms.items()):
+        values = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+        for le, count in histogram.samples():
+          lines.append(f'{name}_bucket{labels(**values, le=le)} {count}')
+        lines.append(f'{name}_sum{labels(**values)} {histogram.sum!r}')
+        lines.append(f'{name}_count{labels(**values)} {histogram.count}')
+
+    histograms('tushan_handler_seconds', 'Time spent in a handler per event.',
+               self.handler_seconds, ['event', 'handler'])
+    histograms('tushan_dispatch_seconds', 'Time from dispatching an event until its handlers returned.',
+               self.dispatch_seconds, ['event'])
+    histograms('tushan_queue_wait_seconds', 'Time from publishing to dispatching an event.',
+               self.queue_wait_seconds, ['event'])
+
+    lines.append('# HELP tushan_handler_failures_total Exceptions raised by a handler.')
+    lines.append('# TYPE tushan_handler_failures_total counter')
+    for handler, count in sorted(self.handler_failures.items()):
+      lines.append(f'tushan_handler_failures_total{labels(handler=handler)} {count}')
+
+    depths = Counter()
+    stats = Counter()
+    for channel in self.channels:
+      depths.update(channel.depths())
+      stats.update(channel.stats)
+
+    lines.append('# HELP tushan_queue_depth Events waiting to be dispatched.')
+    lines.append('# TYPE tushan_queue_depth gauge')
+    for priority, depth in sorted(depths.items()):
+      lines.append(f'tushan_queue_depth{labels(priority=priority.name)} {depth}')
+
+    lines.append('# HELP tushan_events_total Events by what happened when publishing them.')
+    lines.append('# TYPE tushan_events_total counter')
+    for (outcome, priority), count in sorted(stats.items()):
+      lines.append(f'tushan_events_total{labels(outcome=outcome, priority=priority.name)} {count}')
+
+    for name, type, help, collect in self.collectors:
+      lines.append(f'# HELP {name} {help}')
+      lines.append(f'# TYPE {name} {type}')
+      for values, value in collect():
+        lines.append(f'{name}{labels(**values)} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer(object):
+  """Serves the metrics over HTTP to eg. Prometheus."""
+  def __init__(self, metrics, host, port):
+    self.metrics = metrics
+    self.host = host
+    self.port = port
+
+  async def start(self):
+    return await aio.start_server(self.client_connected, self.host, self.port)
+
+  async def client_connected(self, reader, writer):
+    try:
+      # the request is ignored, only wait until its head is complete
+      while (await reader.readline()).strip():
+        pass
+
+      body = self.metrics.render().encode('utf-8')
+      writer.write(b'HTTP/1.0 200 OK\r\n'
+                   b'Content-Type: text/plain; version=0.0.4\r\n'
+                   b'Content-Length: ' + str(len(body)).encode('ascii') + b'\r\n'
+                   b'\r\n' + body)
+      await writer.drain()
+    finally:
+      writer.close()
@@ -1,50 +1,149 @@
 import argparse
 import asyncio as aio
+import random
 
 from net.server import *
-from eventing.event_queue import Event, EventQueue, HandlerFailedEvent
-from arena.lobby import Lobby
+from eventing.event_queue import Event, EventQueue, HandlerFailedEvent, Priority, ShardedEventQueue
+from eventing.journal import Journal
+from eventing.metrics import Metrics, MetricsServer
+from net.codec import journal_codec
+from net.workers import WorkerPool
+from arena.lobby import Lobby, Referee
 from arena.message_translator import MessageTranslator
 from arena import events as evt
 
 
 class BootstrapEvent(Event):
   """Sent as the very first event in an EventQueue"""
+  __slots__ = ()
+  # handlers register themselves before any client event is handled
+  priority = Priority.Control
 
 
 class Tushan(object):
   def create_argparser(self):
     parser = argparse.ArgumentParser(description='Tushan game server')
     parser.add_argument('-d', '--debug', action='store_true')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='broadcast concurrently to the game logic')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='number of event queues parsing the messages of clients, '
+                             'the games are handled in the first one')
+    parser.add_argument('--queue-size', type=int, default=1000,
+                        help='events queued per priority before publishers wait, 0 for no limit')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='spread the running games over this many processes')
+    parser.add_argument('--client-buffer', type=int, default=1 << 20, metavar='BYTES',
+                        help='bytes queued for a client before --slow-clients applies')
+    parser.add_argument('--slow-clients', choices=[p.value for p in SlowClientPolicy],
+                        default=SlowClientPolicy.Coalesce.value,
+                        help='drop new messages, replace queued game states or disconnect')
+    parser.add_argument('--metrics-port', type=int,
+                        help='serve Prometheus metrics on this port of localhost')
+    parser.add_argument('--board-size', type=int, default=18,
+                        help='even edge length of the board')
+    parser.add_argument('--pieces', choices=['official', 'generated'], default='official')
+    parser.add_argument('--piece-count', type=int, default=28,
+                        help='number of generated pieces per game')
+    parser.add_argument('--piece-width', type=int, nargs=2, default=[1, 3],
+                        metavar=('MIN', 'MAX'), help='width range of generated pieces')
+    parser.add_argument('--piece-height', type=int, nargs=2, default=[1, 3],
+                        metavar=('MIN', 'MAX'), help='height range of generated pieces')
+    parser.add_argument('--seed', type=int, help='seed for drawing players and generated pieces')
+    parser.add_argument('--journal', metavar='PATH',
+                        help='append client events and started games to a journal for replay')
     parser.add_argument('host')
     parser.add_argument('port', type=int)
 
     return parser
 
+  def lobby_settings(self, options):
+    """Return the settings of the Lobby, as stored in journals."""
+    return {
+      'board_size': options.board_size,
+      'pieces': options.pieces,
+      'piece_count': options.piece_count,
+      'piece_width': options.piece_width,
+      'piece_height': options.piece_height,
+      'seed': options.seed,
+    }
+
   def handler_failed(self, event):
     print('ERROR:', event.exception)
 
   async def bootstrap(self, options):
-    event_queue = EventQueue()
-    server = Server(event_queue, options.host, options.port)
+    metrics = Metrics() if options.metrics_port is not None else None
+    if options.shards > 1:
+      event_queue = ShardedEventQueue(options.shards, options.concurrent,
+                                      options.queue_size, metrics)
+    else:
+      event_queue = EventQueue(options.concurrent, maxsize=options.queue_size, metrics=metrics)
+    settings = self.lobby_settings(options)
+
+    limit = options.client_buffer
+    policy = SlowClientPolicy(options.slow_clients)
+    workers = None
+    if options.workers:
+      workers = WorkerPool(options.workers, limit=limit, policy=policy)
+      broadcaster = workers.broadcaster
+    else:
+      broadcaster = Broadcaster(limit, policy)
+    server = Server(event_queue, options.host, options.port, broadcaster)
 
-    lobby = Lobby()
-    message_translator = MessageTranslator()
+    if metrics:
+      metrics.collect('tushan_client_buffered_bytes', 'gauge',
+                      'Bytes waiting to be sent to a client.', broadcaster.buffered_bytes)
+      metrics.collect('tushan_client_dropped_messages_total', 'counter',
+                      'Messages dropped for slow clients.', broadcaster.dropped_messages)
+
+    journal = None
+    if options.journal:
+      journal = Journal(options.journal, journal_codec(), settings)
+      event_queue.register_class(journal)
+      aio.create_task(journal.run())
 
     event_queue.register(HandlerFailedEvent, self.handler_failed)
-    event_queue.register(BootstrapEvent, lobby)
-    event_queue.register(BootstrapEvent, message_translator)
+    event_queue.register(BootstrapEvent, Lobby.from_settings(settings))
+    event_queue.register(BootstrapEvent, MessageTranslator())
+    if workers:
+      await workers.start(event_queue)
+    else:
+      event_queue.register(BootstrapEvent, Referee())
 
     # Sent BootstrapEvent to allow other components to register listeners themselves
     event = BootstrapEvent()
     await event_queue.publish(event)
 
     await server.start()
-    await event_queue.run()
+    if metrics:
+      await MetricsServer(metrics, '127.0.0.1', options.metrics_port).start()
+
+    try:
+      await event_queue.run()
+    finally:
+      if journal:
+        journal.close()
+      if workers:
+        await workers.stop()
 
   def run(self):
     argparser = self.create_argparser()
     options = argparser.parse_args()
+    if options.board_size <= 0 or options.board_size % 2:
+      argparser.error('board size must be positive and even')
+    if options.queue_size < 0:
+      argparser.error('queue size must not be negative')
+    if options.shards < 1:
+      argparser.error('at least one shard is needed')
+    if options.client_buffer <= 0:
+      argparser.error('client buffer must be positive')
+    if options.workers < 0:
+      argparser.error('number of workers must not be negative')
+    if options.pieces == 'generated' and options.piece_count < 2:
+      argparser.error('games need at least two pieces')
+    if options.seed is None:
+      # drawn here so journals can replay the game
+      options.seed = random.randrange(2 ** 32)
 
     aio.run(self.bootstrap(options), debug=options.debug)
 
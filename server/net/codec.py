@@ -0,0 +1,133 @@
+"""Compact encoding of the events coming from clients, eg. for journals,
+and of the events exchanged with the worker processes judging games."""
+
+import json
+import uuid
+
+from arena.lobby import Disqualification, PlayerProxy
+from arena.logic.game import Board, Game
+from arena.logic.piece import Orientation, Piece
+from eventing.journal import Codec
+from .server import *
+
+
+def client_id(payload):
+  return uuid.UUID(bytes=bytes(payload[:16]))
+
+
+def encode_client_ids(ids):
+  return b''.join(id.bytes for id in ids)
+
+
+def decode_client_ids(payload):
+  return [client_id(payload[n:n + 16]) for n in range(0, len(payload), 16)]
+
+
+def encode_message(event):
+  return event.id.bytes + json.dumps(event.json, separators=(',', ':')).encode('utf-8')
+
+
+def decode_message(payload):
+  return MessageReceivedEvent(client_id(payload), json.loads(bytes(payload[16:])))
+
+
+def encode_invalid_message(event):
+  return event.id.bytes + event.payload.encode('utf-8')
+
+
+def decode_invalid_message(payload):
+  content = bytes(payload[16:]).decode('utf-8')
+  try:
+    json.loads(content)
+    exception = None
+  except json.JSONDecodeError as e:
+    exception = e
+
+  return InvalidMessageReceivedEvent(client_id(payload), content, exception)
+
+
+def client_codec():
+  """Return a Codec for the events published by net.server."""
+  codec = Codec()
+  codec.register(1, ClientConnectedEvent,
+                 lambda event: event.id.bytes,
+                 lambda payload: ClientConnectedEvent(client_id(payload), None, None))
+  codec.register(2, ClientDisconnectedEvent,
+                 lambda event: event.id.bytes,
+                 lambda payload: ClientDisconnectedEvent(client_id(payload)))
+  codec.register(3, MessageReceivedEvent, encode_message, decode_message)
+  codec.register(4, InvalidMessageReceivedEvent, encode_invalid_message, decode_invalid_message)
+
+  return codec
+
+
+def encode_game(event):
+  game = event.game
+  # games are encoded before their first turn
+  assert len(game.board.pieces) == 1
+  pieces = [game.board.pieces[0].piece, *game.pieces]
+  return json.dumps({
+    'size': game.board.size,
+    'players': PlayerSerializer.serialize_many(game.players),
+    'pieces': PieceSerializer.serialize_many(pieces),
+  }, separators=(',', ':')).encode('utf-8')
+
+
+def decode_game(payload):
+  content = json.loads(bytes(payload))
+  players = []
+  for player in content['players']:
+    proxy = PlayerProxy(uuid.UUID(player['id']))
+    proxy.objectives = [Board.Side(side) for side in player['objectives']]
+    players.append(proxy)
+
+  pieces = [Piece(p['width'], p['height'], p['connectors']) for p in content['pieces']]
+  board = Board(content['size'])
+  return GameStartedEvent(Game(board, players, pieces))
+
+
+def encode_move(event):
+  move = [event.x, event.y, event.orientation.value]
+  return event.player.bytes + json.dumps(move, separators=(',', ':')).encode('utf-8')
+
+
+def decode_move(payload):
+  x, y, orientation = json.loads(bytes(payload[16:]))
+  return PlayerMoveEvent(client_id(payload), x, y, Orientation(orientation))
+
+
+def encode_disqualification(event):
+  return event.player.id.bytes + event.reason.value.encode('utf-8')
+
+
+def decode_disqualification(payload):
+  reason = Disqualification(bytes(payload[16:]).decode('utf-8'))
+  return DisqualifyPlayerEvent(PlayerProxy(client_id(payload)), reason)
+
+
+def journal_codec():
+  """Return a Codec for the events of clients and the games started for them.
+
+  Replaying a journal needs the games the Lobby started, since when it
+  drew their players depended on the order events were handled in.
+  """
+  codec = client_codec()
+  codec.register(5, GameStartedEvent, encode_game, decode_game)
+
+  return codec
+
+
+def worker_codec():
+  """Return a Codec for the events of games judged by worker processes."""
+  codec = Codec()
+  codec.register(5, GameStartedEvent, encode_game, decode_game)
+  codec.register(6, PlayerMoveEvent, encode_move, decode_move)
+  codec.register(7, PlayerCannotMoveEvent,
+                 lambda event: event.player.bytes,
+                 lambda payload: PlayerCannotMoveEvent(client_id(payload)))
+  codec.register(8, DisqualifyPlayerEvent, encode_disqualification, decode_disqualification)
+  codec.register(9, GameClosedEvent,
+                 lambda event: encode_client_ids(event.players),
+                 lambda payload: GameClosedEvent(decode_client_ids(payload)))
+
+  return codec
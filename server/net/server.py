@@ -1,12 +1,19 @@
 import asyncio as aio
+import itertools
 import json
 import uuid
 
-from eventing.event_queue import Event
+from collections import deque
+from enum import Enum
+
+from eventing.event_queue import Event, Priority
 from arena.events import *
 
 
 class ClientConnectedEvent(Event):
+  __slots__ = ('id', 'reader', 'writer')
+  priority = Priority.Control
+
   def __init__(self, id, reader, writer):
     super().__init__()
     self.id = id
@@ -15,12 +22,24 @@ class ClientConnectedEvent(Event):
 
 
 class ClientDisconnectedEvent(Event):
+  """Sent after the last message of a client"""
+  __slots__ = ('id',)
+  # follows the client's messages through their shard and lane, the
+  # MessageTranslator passes it on to the Lobby as a PlayerLeftEvent
+  routed_by = 'id'
+  priority = Priority.Bulk
+
   def __init__(self, id):
     super().__init__()
     self.id = id
 
 
 class MessageReceivedEvent(Event):
+  __slots__ = ('id', 'json')
+  routed_by = 'id'
+  # the bulk of the traffic, handled once the events it caused are
+  priority = Priority.Bulk
+
   def __init__(self, id, json):
     super().__init__()
     self.id = id
@@ -28,6 +47,10 @@ class MessageReceivedEvent(Event):
 
 
 class InvalidMessageReceivedEvent(Event):
+  __slots__ = ('id', 'payload', 'exception')
+  routed_by = 'id'
+  priority = Priority.Bulk
+
   def __init__(self, id, payload, exception):
     super().__init__()
     self.id = id
@@ -35,14 +58,46 @@ class InvalidMessageReceivedEvent(Event):
     self.exception = exception
 
 
+# events sent to the players of their game
+BROADCAST_EVENTS = [
+  GameStartedEvent,
+  MoveAcceptedEvent,
+  GameIsOverEvent,
+  GameEndedEvent,
+  GameCancelledEvent,
+  FirstTurnEvent
+]
+
+
+def game_batches(events):
+  """Split events into runs of consecutive events of the same game.
+
+  Events without a game are left out.
+  """
+  for game, batch in itertools.groupby(events, lambda event: getattr(event, 'game', None)):
+    if game is not None:
+      yield list(batch)
+
+
+def serialize_events(events):
+  """Return the messages for events as bytes, or None if they have none."""
+  try:
+    return b''.join(json.dumps(event.to_json()).encode('utf-8') for event in events)
+  except AttributeError as e:
+    # events cannot be serialized, so don't send them
+    return None
+
+
 class Server(object):
-  def __init__(self, event_queue, host, port):
+  def __init__(self, event_queue, host, port, broadcaster=None):
+    """broadcaster sends events to the clients, a Broadcaster by default."""
     self.event_queue = event_queue
     self.host = host
     self.port = port
+    self.broadcaster = broadcaster or Broadcaster()
 
   async def start(self):
-    self.event_queue.register_class(Broadcaster())
+    self.event_queue.register_class(self.broadcaster)
 
     await aio.start_server(
       self.client_connected,
@@ -81,6 +136,8 @@ class Reader(object):
 
         event = InvalidMessageReceivedEvent(self.id, payload, e)
 
+      # waits while the queue is full, which leaves further messages
+      # of this client unread in the socket
       await self.event_queue.publish(event)
 
       if self.reader.at_eof():
@@ -90,35 +147,180 @@ class Reader(object):
     await self.event_queue.publish(event)
 
 
+class SlowClientPolicy(Enum):
+  """What to do with a message for a client whose Outbox is full"""
+  Drop = 'drop'             # drop the message
+  Coalesce = 'coalesce'     # drop queued states of a game replaced by the new one,
+                            # disconnect if that is not enough
+  Disconnect = 'disconnect' # close the connection
+
+
+class Outbox(object):
+  """Bounded queue of messages to one client, written by its own task.
+
+  At most limit bytes are queued, beyond that policy applies. A single
+  message is queued even if it exceeds limit on its own.
+
+  A message sent with a snapshot, eg. the game whose complete state it
+  holds, replaces the queued messages of the same snapshot if the client
+  falls behind. Clients need every other message, so those are kept.
+  """
+  def __init__(self, writer, limit=1 << 20, policy=SlowClientPolicy.Coalesce):
+    self.writer = writer
+    self.limit = limit
+    self.policy = policy
+    self.messages = deque()
+    self.queued = 0
+    self.dropped = 0
+    self.closed = False
+    self.ready = aio.Event()
+    self.task = aio.create_task(self.run())
+
+  @property
+  def buffered(self):
+    """Bytes queued here and in the transport of the connection."""
+    transport = getattr(self.writer, 'transport', None)
+    pending = transport.get_write_buffer_size() if transport else 0
+    return self.queued + pending
+
+  def send(self, message, snapshot=None):
+    if self.closed:
+      return
+
+    if self.full(message) and self.policy is SlowClientPolicy.Coalesce:
+      self.coalesce(snapshot)
+
+    if self.full(message):
+      if self.policy is SlowClientPolicy.Drop:
+        self.dropped += 1
+      else:
+        self.close()
+      return
+
+    self.messages.append((message, snapshot))
+    self.queued += len(message)
+    self.ready.set()
+
+  def full(self, message):
+    return bool(self.messages) and self.queued + len(message) > self.limit
+
+  def coalesce(self, snapshot):
+    """Drop the queued messages of snapshot."""
+    if snapshot is None:
+      return
+
+    kept = deque()
+    for message, queued_snapshot in self.messages:
+      if queued_snapshot == snapshot:
+        self.queued -= len(message)
+        self.dropped += 1
+      else:
+        kept.append((message, queued_snapshot))
+    self.messages = kept
+
+  async def run(self):
+    try:
+      while True:
+        if not self.messages:
+          self.ready.clear()
+          await self.ready.wait()
+
+        message, _ = self.messages.popleft()
+        self.queued -= len(message)
+        self.writer.write(message)
+        await self.writer.drain()
+    except ConnectionError:
+      # the client's Reader reports the disconnect
+      self.closed = True
+
+  def close(self):
+    self.closed = True
+    self.task.cancel()
+    self.writer.close()
+
+
 class Broadcaster(object):
+  """Sends the events of each game to its players, through an Outbox per client."""
   events = [
     ClientConnectedEvent,
     MessageReceivedEvent,
     ClientDisconnectedEvent,
-    GameStartedEvent,
-    MoveAcceptedEvent,
-    GameIsOverEvent,
-    GameEndedEvent,
-    GameCancelledEvent,
-    FirstTurnEvent
+    *BROADCAST_EVENTS
   ]
 
-  def __init__(self):
+  lane = 'broadcast'
+  # queued events of one type are sent to each client at once
+  batch = True
+
+  def __init__(self, limit=1 << 20, policy=SlowClientPolicy.Coalesce):
+    """Queue at most limit bytes per client before applying policy."""
+    self.limit = limit
+    self.policy = policy
+    # client id -> Outbox
     self.clients = {}
+    # messages dropped for clients that disconnected since
+    self.dropped = 0
 
-  async def __call__(self, event):
-    if isinstance(event, ClientConnectedEvent):
-      self.clients[event.id] = event.writer
-    elif isinstance(event, ClientDisconnectedEvent):
-      self.clients.pop(event.id)
-    else:
-      try:
-        data = event.to_json()
-        payload = json.dumps(data)
-        for client in self.clients.values():
-          client.write(payload.encode('utf-8'))
-          await client.drain()
-      except AttributeError as e:
-        # event cannot be serialized, so don't send it
-        pass
+  def __call__(self, events):
+    for event in events:
+      if isinstance(event, ClientConnectedEvent):
+        self.connect(event.id, event.writer)
+      elif isinstance(event, ClientDisconnectedEvent):
+        self.disconnect(event.id)
+
+    for batch in self.batches(events):
+      payload = self.serialize(batch)
+      if payload is not None:
+        self.send(payload, self.recipients(batch), self.snapshot(batch))
+
+  def batches(self, events):
+    """Split events into batches sent to the same clients."""
+    return game_batches(events)
+
+  def recipients(self, events):
+    return [player.id for player in events[0].game.players]
+
+  def serialize(self, events):
+    return serialize_events(events)
+
+  def snapshot(self, events):
+    """Return the game events hold the complete state of, or None."""
+    if isinstance(events[0], MoveAcceptedEvent):
+      return events[0].game
+
+    return None
+
+  def connect(self, id, writer):
+    self.clients[id] = Outbox(writer, self.limit, self.policy)
+
+  def disconnect(self, id):
+    # a shard of the client's messages may handle this before the first
+    # shard handled the connect
+    outbox = self.clients.pop(id, None)
+    if outbox is None:
+      return
+
+    outbox.close()
+    self.dropped += outbox.dropped
+
+  def send(self, payload, ids, snapshot=None):
+    for id in ids:
+      # eg. a player who quit the game
+      outbox = self.clients.get(id)
+      if outbox:
+        outbox.send(payload, snapshot)
+
+  def close(self):
+    """Close the connections to all clients."""
+    for outbox in self.clients.values():
+      outbox.close()
+    self.clients.clear()
+
+  def buffered_bytes(self):
+    """Generate (labels, bytes) of the data queued for each client."""
+    for id, outbox in self.clients.items():
+      yield {'client': id}, outbox.buffered
 
+  def dropped_messages(self):
+    """Generate (labels, count) of messages dropped for slow clients."""
+    yield {}, self.dropped + sum(outbox.dropped for outbox in self.clients.values())
@@ -0,0 +1,221 @@
+"""Games judged in worker processes.
+
+The front process owns the sockets of all clients and runs the Lobby,
+which matches players and starts games. Every game is handed to the
+least busy of N worker processes when it starts, and the moves of its
+players are forwarded to the Referee of that worker, so games judged by
+different workers run in parallel. Workers send the serialized
+broadcasts of their games back to the front process, followed by a
+GameClosedEvent once a game is over.
+
+Events cross processes as journal records over socket pairs.
+"""
+
+import asyncio as aio
+import itertools
+import multiprocessing
+import socket
+
+from arena.lobby import Referee
+from eventing.bus import Link
+from eventing.event_queue import Event, EventQueue, Priority
+from .codec import decode_client_ids, encode_client_ids, worker_codec
+from .server import *
+
+
+# type codes of payloads for the players of a game, snapshots hold the
+# complete state of the game
+OUTBOUND = 16
+SNAPSHOT = 17
+
+
+def encode_outbound(ids, payload):
+  return bytes([len(ids)]) + encode_client_ids(ids) + payload
+
+
+def decode_outbound(payload):
+  """Return the client ids and messages of an outbound record."""
+  end = 1 + 16 * payload[0]
+  return decode_client_ids(payload[1:end]), bytes(payload[end:])
+
+
+class OutboundEvent(Event):
+  """Sent when a worker has messages for the players of a game"""
+  __slots__ = ('payload', 'recipients', 'snapshot')
+
+  def __init__(self, payload, recipients, snapshot=None):
+    super().__init__()
+    self.payload = payload
+    self.recipients = recipients
+    self.snapshot = snapshot
+
+
+class WorkerStartedEvent(Event):
+  """Lets the Referee of a worker register itself"""
+  __slots__ = ()
+  priority = Priority.Control
+
+
+class Forwarder(object):
+  """Sends the broadcasts of a worker to the front process."""
+  events = BROADCAST_EVENTS
+  batch = True
+
+  def __init__(self, link):
+    self.link = link
+
+  async def __call__(self, events):
+    for batch in game_batches(events):
+      payload = serialize_events(batch)
+      if payload:
+        code = SNAPSHOT if isinstance(batch[0], MoveAcceptedEvent) else OUTBOUND
+        ids = [player.id for player in batch[0].game.players]
+        await self.link.send_record(code, encode_outbound(ids, payload))
+
+
+async def serve_worker(sock):
+  """Judge the games handed to a worker until the front process disconnects."""
+  link = await Link.open(sock, worker_codec())
+  event_queue = EventQueue()
+
+  event_queue.register(WorkerStartedEvent, Referee())
+  event_queue.register_class(Forwarder(link))
+  event_queue.register(GameClosedEvent, link.send)
+  await event_queue.publish(WorkerStartedEvent())
+
+  task = aio.create_task(event_queue.run())
+  try:
+    async for code, payload in link.records():
+      await event_queue.publish(link.codec.decode(code, payload))
+  finally:
+    task.cancel()
+    link.close()
+
+
+def run_worker(sock):
+  aio.run(serve_worker(sock))
+
+
+class WorkerPool(object):
+  """Hands games to worker processes and forwards the events of their players.
+
+  Register it with the front process' EventQueue, which runs the Lobby
+  instead of a Referee, and pass the pool's broadcaster to the Server.
+  """
+  events = [
+    GameStartedEvent,
+    PlayerMoveEvent,
+    PlayerCannotMoveEvent,
+    DisqualifyPlayerEvent,
+    GameClosedEvent
+  ]
+
+  # keeps the events of each game in order
+  lane = 'workers'
+
+  def __init__(self, count, **broadcaster_args):
+    """Run count workers, broadcaster_args are passed on to the WorkerBroadcaster."""
+    assert count > 0
+    self.count = count
+    self.processes = []
+    self.links = []
+    self.tasks = []
+    # player id -> worker judging the player's game
+    self.workers = {}
+    # number of running games per worker
+    self.load = [0] * count
+    # players of a running game -> number of the game, which tells the
+    # snapshots of games between the same players apart
+    self.numbers = {}
+    self.games = 0
+    self.broadcaster = WorkerBroadcaster(**broadcaster_args)
+
+  async def start(self, event_queue):
+    context = multiprocessing.get_context('spawn')
+    for worker in range(self.count):
+      front, back = socket.socketpair()
+      process = context.Process(target=run_worker, args=(back,), daemon=True)
+      process.start()
+      back.close()
+
+      link = await Link.open(front, worker_codec())
+      self.processes.append(process)
+      self.links.append(link)
+      self.tasks.append(aio.create_task(self.receive(link, event_queue)))
+
+    event_queue.register_class(self)
+
+  async def receive(self, link, event_queue):
+    async for code, payload in link.records():
+      if code in (OUTBOUND, SNAPSHOT):
+        ids, messages = decode_outbound(payload)
+        # a game's snapshots arrive before it is closed
+        snapshot = self.numbers.get(frozenset(ids)) if code == SNAPSHOT else None
+        event = OutboundEvent(messages, ids, snapshot)
+      else:
+        event = link.codec.decode(code, payload)
+      await event_queue.publish(event)
+
+  async def __call__(self, event):
+    if isinstance(event, GameStartedEvent):
+      worker = self.start_game([player.id for player in event.game.players])
+    elif isinstance(event, GameClosedEvent):
+      self.close_game(event.players)
+      return
+    elif isinstance(event, DisqualifyPlayerEvent):
+      worker = self.workers.get(event.player.id)
+    else:
+      worker = self.workers.get(event.player)
+
+    # events of players without a running game are dropped, as the Referee would
+    if worker is not None:
+      await self.links[worker].send(event)
+
+  def start_game(self, ids):
+    """Pin the game of the players with ids to the least busy worker and return it."""
+    worker = min(range(self.count), key=self.load.__getitem__)
+    self.load[worker] += 1
+    for id in ids:
+      self.workers[id] = worker
+
+    self.numbers[frozenset(ids)] = self.games
+    self.games += 1
+    return worker
+
+  def close_game(self, ids):
+    for id in ids:
+      worker = self.workers.pop(id)
+    self.load[worker] -= 1
+    del self.numbers[frozenset(ids)]
+
+  async def stop(self, timeout=5):
+    """Disconnect from the workers and wait for them to exit."""
+    for link in self.links:
+      link.close()
+    for task in self.tasks:
+      task.cancel()
+
+    loop = aio.get_running_loop()
+    for process in self.processes:
+      await loop.run_in_executor(None, process.join, timeout)
+      if process.is_alive():
+        process.terminate()
+
+
+class WorkerBroadcaster(Broadcaster):
+  """Sends the messages serialized by the workers to the players of their games."""
+  events = [ClientConnectedEvent, ClientDisconnectedEvent, OutboundEvent]
+
+  def batches(self, events):
+    outbound = (event for event in events if isinstance(event, OutboundEvent))
+    for _, batch in itertools.groupby(outbound, lambda event: (event.recipients, event.snapshot)):
+      yield list(batch)
+
+  def recipients(self, events):
+    return events[0].recipients
+
+  def serialize(self, events):
+    return b''.join(event.payload for event in events)
+
+  def snapshot(self, events):
+    return events[0].snapshot
@@ -0,0 +1,48 @@
+import random
+import unittest
+
+from arena.logic.game import Board
+from arena.logic.piece import Orientation, Piece, PlacedPiece
+
+
+class DockingIndexTest(unittest.TestCase):
+  def setUp(self):
+    self.rng = random.Random(4)
+    self.pieces = Piece.official_pieces()
+
+  def candidates(self, board, piece):
+    for x in range(board.size + 1):
+      for y in range(board.size + 1):
+        for o in Orientation:
+          yield PlacedPiece(piece, x, y, o, None)
+
+  def assertIndexMatchesPairwise(self, board, piece):
+    for candidate in self.candidates(board, piece):
+      if not board.contains(candidate) or board.collides_any(candidate):
+        continue
+
+      expected = any(candidate.connects_to(p) for p in board.pieces)
+      self.assertEqual(expected, board.connects_one(candidate))
+
+  def test_connects_one_matches_pairwise_check(self):
+    board = Board(8)
+    board.place_initial(self.pieces[0])
+
+    for piece in self.pieces[1:8]:
+      self.assertIndexMatchesPairwise(board, piece)
+
+      placements = list(board.valid_placements(piece))
+      if not placements:
+        break
+
+      p = self.rng.choice(placements)
+      board.place(piece, p.x, p.y, p.orientation, None)
+
+  def test_shared_docks_are_closed(self):
+    board = Board(8)
+    board.place_initial(Piece(2, 2, [2, 5]))
+    board.place(Piece(1, 3, [0, 1, 4]), 5, 4, Orientation.East, None)
+
+    self.assertNotIn((10, 7), board.docks)
+    self.assertIn((10, 9), board.docks)
+    self.assertEqual(14, len(board.docks))
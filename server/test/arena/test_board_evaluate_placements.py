@@ -0,0 +1,89 @@
+import random
+import unittest
+
+from arena.logic.game import Board, Game, Player
+from arena.logic.piece import Orientation, Piece
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+
+@unittest.skipIf(np is None, 'numpy not installed')
+class EvaluatePlacementsTest(unittest.TestCase):
+  def setUp(self):
+    self.pieces = [
+      Piece(2, 2, [2, 5]),
+      Piece(1, 3, [0, 1, 4]),
+      Piece(2, 3, [5, 7, 8, 9]),
+      *Piece.official_pieces()
+    ]
+
+  def grid(self, board):
+    positions = [(x, y, o)
+                 for x in range(-2, board.size + 3)
+                 for y in range(-2, board.size + 3)
+                 for o in Orientation]
+    xs, ys, orientations = zip(*positions)
+    return positions, np.array(xs), np.array(ys), list(orientations)
+
+  def assertSameAsScalar(self, board, piece):
+    positions, xs, ys, orientations = self.grid(board)
+    mask = board.evaluate_placements(piece, xs, ys, orientations)
+
+    expected = [board.is_valid_at(piece.template(o), x, y) for x, y, o in positions]
+    self.assertListEqual(expected, mask.tolist())
+
+  def test_same_as_scalar_check(self):
+    rng = random.Random(3)
+    board = Board(10)
+    board.place_initial(self.pieces[0])
+
+    for piece in self.pieces[1:12]:
+      for other in self.pieces[:4]:
+        self.assertSameAsScalar(board, other)
+
+      placements = list(board.valid_placements(piece))
+      if not placements:
+        break
+
+      p = rng.choice(placements)
+      board.place(piece, p.x, p.y, p.orientation, None)
+
+  def test_orientation_indices_and_broadcasting(self):
+    board = Board(8)
+    board.place_initial(self.pieces[0])
+
+    mask = board.evaluate_placements(self.pieces[1], [5, 6, 3], 4, [2, 0, 2])
+    self.assertListEqual([False, True, False], mask.tolist())
+
+  def test_rejects_unaligned_coordinates(self):
+    board = Board(8)
+    board.place_initial(self.pieces[0])
+
+    with self.assertRaises(TypeError):
+      board.evaluate_placements(self.pieces[1], [6.5], 4, [0])
+
+  def test_valid_placements_are_accepted(self):
+    board = Board(8)
+    board.place_initial(self.pieces[0])
+    placements = list(board.valid_placements(self.pieces[1]))
+
+    mask = board.evaluate_placements(self.pieces[1],
+                                     [p.x for p in placements],
+                                     [p.y for p in placements],
+                                     [p.orientation for p in placements])
+    self.assertTrue(mask.all())
+
+  def test_placements_at_numpy_coordinates(self):
+    game = Game(Board(8), [Player(1, [0, 1]), Player(2, [2, 3])],
+                [self.pieces[0], self.pieces[1], self.pieces[2]])
+    positions, xs, ys, orientations = self.grid(game.board)
+    orientations = np.array([list(Orientation).index(o) for o in orientations])
+    mask = game.board.evaluate_placements(self.pieces[1], xs, ys, orientations)
+
+    x, y = xs[mask][0], ys[mask][0]
+    self.assertIsInstance(x, np.integer)
+    placed = game.push_move(x, y, list(Orientation)[orientations[mask][0]])
+    self.assertIs(placed, game.board.pieces[-1])
@@ -1,7 +1,8 @@
+import random
 import unittest
 
-from arena.logic.game import Board
-from arena.logic.piece import Orientation, Piece
+from arena.logic.game import Board, InvalidPlacementError
+from arena.logic.piece import Orientation, Piece, PlacedPiece
 
 
 class ValidPlacementsTest(unittest.TestCase):
@@ -30,3 +31,57 @@ class ValidPlacementsTest(unittest.TestCase):
     for expected_placement in expected_placements:
       ok = any(expected_placement == (p.x, p.y, p.orientation) for p in placements)
       self.assertTrue(ok)
+
+  def test_same_placements_as_full_scan(self):
+    rng = random.Random(7)
+    pieces = Piece.official_pieces()
+    board = Board(10)
+    board.place_initial(pieces[0])
+
+    for piece in pieces[1:]:
+      placements = [(p.x, p.y, p.orientation) for p in board.valid_placements(piece)]
+      self.assertEqual(len(set(placements)), len(placements))
+      self.assertSetEqual(self.full_scan(board, piece), set(placements))
+
+      if not placements:
+        break
+
+      x, y, orientation = rng.choice(placements)
+      board.place(piece, x, y, orientation, None)
+
+  def test_incremental_placements(self):
+    rng = random.Random(11)
+    pieces = Piece.official_pieces()
+    board = Board(10)
+    incremental_board = Board(10, incremental=True)
+    board.place_initial(pieces[0])
+    incremental_board.place_initial(pieces[0])
+
+    for piece in pieces[1:]:
+      for other in pieces:
+        expected = {(p.x, p.y, p.orientation) for p in board.valid_placements(other)}
+        placements = {(p.x, p.y, p.orientation) for p in incremental_board.valid_placements(other)}
+        self.assertSetEqual(expected, placements)
+
+      placements = list(board.valid_placements(piece))
+      if not placements:
+        break
+
+      p = rng.choice(placements)
+      board.place(piece, p.x, p.y, p.orientation, None)
+      incremental_board.place(piece, p.x, p.y, p.orientation, None)
+
+    self.assertEqual(len(pieces), len(incremental_board.placements))
+
+  def full_scan(self, board, piece):
+    placements = set()
+    for x in range(board.size + 1):
+      for y in range(board.size + 1):
+        for o in Orientation:
+          try:
+            board.validate_placement(PlacedPiece(piece, x, y, o, None))
+            placements.add((x, y, o))
+          except InvalidPlacementError:
+            pass
+
+    return placements
@@ -26,3 +26,12 @@ class OverlappingPiecesBoardTest(unittest.TestCase):
   def test_overlap_bottom_placement(self):
     with self.assertRaises(InvalidPlacementError):
       self.board.place(self.piece2, 4, 7, Orientation.North, None)
+
+  def test_overlap_with_later_placement(self):
+    self.board.place(self.piece2, 5, 3, Orientation.South, None)
+    with self.assertRaises(InvalidPlacementError):
+      self.board.place(self.piece2, 6, 5, Orientation.West, None)
+
+  def test_not_aligned_placement(self):
+    with self.assertRaises(InvalidPlacementError):
+      self.board.place(self.piece2, 5.5, 3, Orientation.South, None)
@@ -0,0 +1,48 @@
+import unittest
+
+from arena.logic.game import Board, Game, Player
+from arena.logic.piece import Orientation, Piece
+
+
+class GameIsOverTest(unittest.TestCase):
+  def setUp(self):
+    self.player1 = Player(1, [Board.Side.East, Board.Side.West])
+    self.player2 = Player(2, [Board.Side.North, Board.Side.South])
+    self.players = [self.player1, self.player2]
+
+  def test_not_over_with_valid_placement(self):
+    pieces = [Piece(2, 2, [2, 5]), Piece(1, 3, [0, 1, 4])]
+    game = Game(Board(8), self.players, pieces)
+
+    self.assertTrue(game.board.has_valid_placement(pieces[1]))
+    self.assertFalse(game.is_over())
+
+  def test_over_without_connectors(self):
+    pieces = [Piece(2, 2, []), Piece(1, 3, [0, 1, 4])]
+    game = Game(Board(8), self.players, pieces)
+
+    self.assertFalse(game.board.has_valid_placement(pieces[1]))
+    self.assertTrue(game.is_over())
+
+  def test_over_with_connectors_on_border_only(self):
+    pieces = [Piece(2, 2, [0, 1, 2, 3, 4, 5, 6, 7]), Piece(1, 3, [0])]
+    game = Game(Board(2), self.players, pieces)
+
+    self.assertTrue(game.is_over())
+
+  def test_over_without_pieces(self):
+    pieces = [Piece(2, 2, [2, 5]), Piece(1, 3, [0, 1, 4])]
+    game = Game(Board(8), self.players, pieces)
+    game.make_turn(self.player1, pieces[1], 5, 4, Orientation.East)
+
+    self.assertTrue(game.is_over())
+
+  def test_incremental_board(self):
+    pieces = [Piece(2, 2, [2, 5]), Piece(1, 3, [0, 1, 4]), Piece(1, 3, [])]
+    game = Game(Board(8, incremental=True), self.players, pieces)
+
+    self.assertEqual(6, len(list(game.board.valid_placements(pieces[1]))))
+    self.assertFalse(game.is_over())
+
+    game.make_turn(self.player1, pieces[1], 5, 4, Orientation.East)
+    self.assertTrue(game.is_over())
@@ -1,5 +1,7 @@
 import unittest
 
+from collections import Counter
+
 from arena.logic.game import Board, Game, Player
 from arena.logic.piece import DockingPoint, Orientation, Piece, PlacedPiece
 
@@ -74,3 +76,19 @@ class GameScoreTest(unittest.TestCase):
       self.player2: 6
     }
     self.assertDictEqual(expected_scores, game.scores())
+
+  def test_connector_counters(self):
+    _, p2, p3, p4, p5, p6, p7 = self.pieces
+
+    board = Board(8)
+    game = Game(board, self.players, self.pieces)
+    game.make_turn(self.player1, p2, 3, 0, Orientation.South)
+    game.make_turn(self.player2, p3, 4, 0, Orientation.South)
+    game.make_turn(self.player1, p4, 5, 3, Orientation.South)
+
+    expected = Counter(dock.board_side(board)
+                       for placed_piece in board.pieces
+                       for dock in placed_piece.docking_points()
+                       if dock.is_connector and dock.board_side(board))
+    self.assertDictEqual(expected, board.connectors)
+    self.assertEqual(2, board.connectors[Board.Side.North])
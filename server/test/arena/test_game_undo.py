@@ -0,0 +1,72 @@
+import random
+import unittest
+
+from arena.logic.game import Board, Game, NoMoveToUndoError, Player
+from arena.logic.piece import Piece
+
+
+class GameUndoTest(unittest.TestCase):
+  def setUp(self):
+    self.rng = random.Random(5)
+    self.pieces = Piece.official_pieces()
+    self.player1 = Player(1, [Board.Side.East, Board.Side.West])
+    self.player2 = Player(2, [Board.Side.North, Board.Side.South])
+    self.game = Game(Board(10, incremental=True), [self.player1, self.player2], self.pieces)
+
+  def state(self):
+    board = self.game.board
+    placements = {
+      piece.shape: {(p.x, p.y, p.orientation) for p in board.valid_placements(piece)}
+      for piece in self.pieces[:4]
+    }
+
+    return (
+      bytes(board.occupancy),
+      {key: (c, (p.x, p.y, p.orientation)) for key, (c, p) in board.docks.items()},
+      set(board.anchors),
+      +board.connectors,
+      len(board.pieces),
+      list(self.game.players),
+      list(self.game.pieces),
+      placements
+    )
+
+  def play(self, turns):
+    for _ in range(turns):
+      if self.game.is_over():
+        break
+
+      p = self.rng.choice(list(self.game.board.valid_placements(self.game.current_piece)))
+      self.game.push_move(p.x, p.y, p.orientation)
+
+  def test_pop_move_restores_state(self):
+    states = [self.state()]
+    while not self.game.is_over():
+      self.play(1)
+      states.append(self.state())
+
+    self.assertGreater(len(states), 10)
+
+    for expected in reversed(states[:-1]):
+      self.game.pop_move()
+      self.assertEqual(expected, self.state())
+
+  def test_pop_move_without_moves(self):
+    with self.assertRaises(NoMoveToUndoError):
+      self.game.pop_move()
+
+  def test_restore_snapshot(self):
+    self.play(6)
+    snapshot = self.game.snapshot()
+    expected = self.state()
+
+    self.play(5)
+    self.game.restore(snapshot)
+    self.assertEqual(expected, self.state())
+
+    self.game.pop_move()
+    self.game.pop_move()
+    self.play(4)
+    self.game.restore(snapshot)
+    self.assertEqual(expected, self.state())
+    self.assertEqual(snapshot, self.game.snapshot())
@@ -0,0 +1,148 @@
+import asyncio as aio
+import random
+import unittest
+import uuid
+
+from collections import defaultdict
+
+from arena.events import GameCancelledEvent
+from arena.lobby import Lobby, PlayerProxy, Referee
+from arena.message_translator import MessageTranslator
+from arena.logic.piece import Piece
+from eventing.event_queue import Event, EventQueue, ShardedEventQueue
+from net.server import BROADCAST_EVENTS, ClientConnectedEvent, ClientDisconnectedEvent, MessageReceivedEvent
+
+
+class LobbyTest(unittest.TestCase):
+  def test_build_game_with_configured_board_and_pieces(self):
+    pieces = Piece.generated_pieces(40, random.Random(2))
+    lobby = Lobby(board_size=64, pieces=lambda: list(pieces))
+    lobby.players = {n: PlayerProxy(n) for n in range(2)}
+
+    game = lobby.build_game()
+
+    self.assertEqual(64, game.board.size)
+    self.assertIs(pieces[0], game.board.pieces[0].piece)
+    self.assertEqual(39, len(game.pieces))
+
+  def test_build_game_defaults(self):
+    lobby = Lobby()
+    lobby.players = {n: PlayerProxy(n) for n in range(2)}
+
+    game = lobby.build_game()
+
+    self.assertEqual(18, game.board.size)
+    self.assertEqual(27, len(game.pieces))
+
+  def test_games_track_no_placements(self):
+    pieces = Piece.generated_pieces(40, random.Random(3))
+    lobby = Lobby(board_size=32, pieces=lambda: list(pieces), rng=random.Random(4))
+    lobby.players = {n: PlayerProxy(n) for n in range(2)}
+
+    game = lobby.build_game()
+    while not game.is_over():
+      placement = next(game.board.valid_placements(game.current_piece))
+      game.push_move(placement.x, placement.y, placement.orientation)
+
+    self.assertFalse(game.board.incremental)
+    self.assertDictEqual({}, game.board.placements)
+
+
+class LobbyStartedEvent(Event):
+  __slots__ = ()
+
+
+class LobbyEventsTest(unittest.IsolatedAsyncioTestCase):
+  """Broadcasts reach players in the order the Lobby published them."""
+  def create_event_queue(self):
+    return EventQueue()
+
+  async def asyncSetUp(self):
+    self.event_queue = self.create_event_queue()
+    # player id -> types of the messages for the player
+    self.broadcasts = defaultdict(list)
+    self.lobby = Lobby(rng=random.Random(1))
+    self.referee = Referee()
+    self.event_queue.register(LobbyStartedEvent, self.lobby)
+    self.event_queue.register(LobbyStartedEvent, self.referee)
+    self.event_queue.register(LobbyStartedEvent, MessageTranslator())
+    # sending the cancellation takes a while, eg. for slow clients
+    self.event_queue.register(GameCancelledEvent, lambda event: aio.sleep(0.01))
+    for event_class in BROADCAST_EVENTS:
+      self.event_queue.register(event_class, self.broadcast)
+
+    self.task = aio.create_task(self.event_queue.run())
+    await self.event_queue.publish(LobbyStartedEvent())
+    await self.event_queue.join()
+
+  async def asyncTearDown(self):
+    self.task.cancel()
+    await aio.gather(self.task, return_exceptions=True)
+
+  def broadcast(self, event):
+    for player in event.game.players:
+      self.broadcasts[player.id].append(event.to_json()['type'])
+
+  async def connect(self, count):
+    ids = [uuid.uuid4() for _ in range(count)]
+    for id in ids:
+      await self.event_queue.publish(ClientConnectedEvent(id, None, None))
+    await self.event_queue.join()
+    return ids
+
+  async def test_free_players_start_games_at_once(self):
+    ids = await self.connect(5)
+
+    games = {id(game) for game in self.referee.games.values()}
+    self.assertEqual(2, len(games))
+    self.assertEqual(1, len(self.lobby.free_players()))
+    for player in ids:
+      expected = ['gamestarted', 'firstturn'] if player in self.referee.games else []
+      self.assertListEqual(expected, self.broadcasts[player])
+
+  async def test_last_move_is_handled_before_the_disconnect(self):
+    ids = await self.connect(2)
+    game = self.referee.games[ids[0]]
+    player = game.current_player
+    placement = next(game.board.valid_placements(game.current_piece))
+    move = {
+      'type': 'move',
+      'x': placement.x,
+      'y': placement.y,
+      'orientation': placement.orientation.value
+    }
+
+    await self.event_queue.publish(MessageReceivedEvent(player.id, move))
+    await self.event_queue.publish(ClientDisconnectedEvent(player.id))
+    await self.event_queue.join()
+
+    opponent, = [id for id in ids if id != player.id]
+    expected = ['gamestarted', 'firstturn', 'moveaccepted', 'gamecancelled']
+    self.assertListEqual(expected, self.broadcasts[opponent])
+    self.assertListEqual([opponent], list(self.lobby.players))
+
+  async def test_cancelled_game_is_announced_before_the_next_one(self):
+    ids = await self.connect(4)
+
+    # a move off the board disqualifies its player, whoever's turn it is
+    move = {'type': 'move', 'x': 100, 'y': 100, 'orientation': 'north'}
+    for _ in range(3):
+      games = {id(game): game for game in self.referee.games.values()}
+      for game in games.values():
+        await self.event_queue.publish(MessageReceivedEvent(game.players[0].id, move))
+      await self.event_queue.join()
+
+    started = ['gamestarted', 'firstturn']
+    cancelled = ['gamecancelled', 'gamestarted', 'firstturn']
+    for player in ids:
+      self.assertListEqual(started + cancelled * 3, self.broadcasts[player])
+
+
+class ShardedLobbyEventsTest(LobbyEventsTest):
+  def create_event_queue(self):
+    return ShardedEventQueue(4)
+
+  def broadcast(self, event):
+    # one consumer handles all broadcasts, whatever their game
+    self.assertIs(self.event_queue.shards[0], self.event_queue.shard_for(event))
+    super().broadcast(event)
@@ -1,3 +1,4 @@
+import random
 import unittest
 
 from arena.logic.piece import DockingPoint, Orientation, Piece, PlacedPiece
@@ -156,3 +157,38 @@ class PieceTest(unittest.TestCase):
   def test_p4_connects_to_p6(self):
     self.assertTrue(self.placed_piece4.connects_to(self.placed_piece6))
     self.assertTrue(self.placed_piece6.connects_to(self.placed_piece4))
+
+  def test_template_is_cached(self):
+    piece = self.placed_piece6.piece
+    self.assertIs(piece.template(Orientation.West), piece.template(Orientation.West))
+    self.assertIs(piece.template(Orientation.West), self.placed_piece6.template)
+
+  def test_p6_cells(self):
+    expected_cells = [(x, 4) for x in range(1, 7)]
+    self.assertListEqual(expected_cells, self.placed_piece6.cells())
+
+  def test_p5_north_docks(self):
+    expected_docks = [(9, 2, False), (8, 1, True), (9, 0, True), (10, 1, False)]
+    self.assertListEqual(expected_docks, self.pp5_north.docks())
+
+  def test_generated_pieces(self):
+    pieces = Piece.generated_pieces(50, random.Random(1), widths=(1, 4), heights=(2, 3))
+    same_pieces = Piece.generated_pieces(50, random.Random(1), widths=(1, 4), heights=(2, 3))
+
+    self.assertEqual([p.shape for p in pieces], [p.shape for p in same_pieces])
+    for piece in pieces:
+      self.assertTrue(1 <= piece.width <= 4)
+      self.assertTrue(2 <= piece.height <= 3)
+      self.assertGreater(len(piece.connectors), 0)
+
+  def test_p5_side_masks(self):
+    template = self.placed_piece5.template
+    self.assertEqual((0, 1, 1, 0), (template.north, template.east, template.south, template.west))
+
+    template = self.pp5_west.template
+    self.assertEqual((0, 0, 1, 1), (template.north, template.east, template.south, template.west))
+
+  def test_p6_side_masks(self):
+    template = self.placed_piece6.template
+    self.assertEqual(0b110011, template.north)
+    self.assertEqual(0, template.east | template.south | template.west)
@@ -0,0 +1,148 @@
+import asyncio as aio
+import os
+import tempfile
+import unittest
+import uuid
+
+from arena.events import GameEndedEvent, GameStartedEvent
+from arena.lobby import Lobby, Referee
+from arena.message_translator import MessageTranslator
+from arena.replay import replay_journal
+from eventing.event_queue import Event, EventQueue, Priority
+from eventing.journal import Journal
+from net.codec import journal_codec
+from net.server import ClientConnectedEvent, ClientDisconnectedEvent, MessageReceivedEvent
+
+
+SETTINGS = {
+  'board_size': 18,
+  'pieces': 'official',
+  'piece_count': 28,
+  'piece_width': [1, 3],
+  'piece_height': [1, 3],
+  'seed': 5,
+}
+
+
+class LiveStartedEvent(Event):
+  __slots__ = ()
+  priority = Priority.Control
+
+
+class ReplayTest(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.path = os.path.join(directory.name, 'journal')
+
+  async def asyncSetUp(self):
+    self.games = []
+    self.results = []
+    await self.start_server()
+
+  async def asyncTearDown(self):
+    await self.stop_server()
+
+  async def start_server(self):
+    # registered like the server does, events are queued by priority
+    self.journal = Journal(self.path, journal_codec(), SETTINGS)
+    self.referee = Referee()
+    self.event_queue = EventQueue()
+    self.event_queue.register_class(self.journal)
+    self.event_queue.register(LiveStartedEvent, Lobby.from_settings(SETTINGS))
+    self.event_queue.register(LiveStartedEvent, self.referee)
+    self.event_queue.register(LiveStartedEvent, MessageTranslator())
+    self.event_queue.register(GameStartedEvent, self.game_started)
+    self.event_queue.register(GameEndedEvent, self.game_ended)
+    self.task = aio.create_task(self.event_queue.run())
+    await self.event_queue.publish(LiveStartedEvent())
+
+  async def stop_server(self):
+    self.task.cancel()
+    await aio.gather(self.task, return_exceptions=True)
+    self.journal.close()
+
+  def game_started(self, event):
+    self.games.append([str(player.id) for player in event.game.players])
+
+  def game_ended(self, event):
+    self.results.append({
+      'winner': None if event.winner is None else str(event.winner.id),
+      'scores': {str(player.id): score for player, score in event.scores.items()},
+    })
+
+  async def send(self, client, message):
+    await self.event_queue.publish(MessageReceivedEvent(client, message))
+    await self.event_queue.join()
+
+  async def connect(self, count):
+    # connected at once, all clients are in the Lobby before it draws players
+    clients = [uuid.uuid4() for _ in range(count)]
+    for client in clients:
+      await self.event_queue.publish(ClientConnectedEvent(client, None, None))
+    await self.event_queue.publish(MessageReceivedEvent(clients[0], {'type': 'name', 'name': 'a'}))
+    await self.event_queue.join()
+    return clients
+
+  def running_games(self):
+    return list({id(game): game for game in self.referee.games.values()}.values())
+
+  async def play_game(self, game):
+    while self.referee.is_running(game):
+      player = game.current_player.id
+      placement = None
+      if game.pieces:
+        placement = next(game.board.valid_placements(game.current_piece), None)
+
+      if placement is None:
+        await self.send(player, {'type': 'gameover'})
+      else:
+        await self.send(player, {'type': 'move', 'x': placement.x, 'y': placement.y,
+                                 'orientation': placement.orientation.value})
+
+  async def test_replay_reconstructs_games(self):
+    clients = await self.connect(6)
+    games = self.running_games()
+    self.assertEqual(3, len(games))
+
+    # the players of the finished game start another one
+    await self.play_game(games[0])
+    # and another game is cancelled when one of its players quits
+    await self.event_queue.publish(ClientDisconnectedEvent(games[1].players[0].id))
+    await self.event_queue.join()
+    await self.stop_server()
+
+    replay, _ = await replay_journal(self.path)
+    summary = replay.summary()
+
+    self.assertEqual(4, len(self.games))
+    self.assertListEqual(self.games, summary['games'])
+    self.assertListEqual(self.results, summary['results'])
+    self.assertEqual(1, summary['games_ended'])
+    self.assertEqual(1, summary['games_cancelled'])
+    self.assertEqual(0, summary['handler_failures'])
+    self.assertEqual('a', replay.lobby.players[clients[0]].name)
+
+  async def test_replay_of_restarted_server(self):
+    # the first run stops in the middle of a game
+    await self.connect(2)
+    game, = self.running_games()
+    placement = next(game.board.valid_placements(game.current_piece))
+    await self.send(game.current_player.id, {'type': 'move', 'x': placement.x, 'y': placement.y,
+                                             'orientation': placement.orientation.value})
+    await self.stop_server()
+
+    await self.start_server()
+    clients = await self.connect(2)
+    await self.play_game(*self.running_games())
+    await self.stop_server()
+
+    replay, _ = await replay_journal(self.path)
+    summary = replay.summary()
+
+    self.assertEqual(2, summary['runs'])
+    self.assertListEqual(self.games, summary['games'])
+    self.assertListEqual(self.results, summary['results'])
+    self.assertEqual(1, summary['games_ended'])
+    self.assertEqual(0, summary['handler_failures'])
+    self.assertEqual('a', replay.lobby.players[clients[0]].name)
@@ -0,0 +1,27 @@
+import unittest
+
+from arena.selfplay import play_game, run_games, summarize
+
+
+class SelfPlayTest(unittest.TestCase):
+  def test_games_are_deterministic(self):
+    result1 = play_game(42, ['random', 'greedy'], board_size=12)
+    result2 = play_game(42, ['random', 'greedy'], board_size=12)
+
+    self.assertGreater(len(result1.moves), 0)
+    self.assertEqual(result1.moves, result2.moves)
+    self.assertEqual(result1.scores, result2.scores)
+
+  def test_process_pool_matches_serial_run(self):
+    serial = run_games(4, ['first', 'random'], seed=3, board_size=10)
+    parallel = run_games(4, ['first', 'random'], seed=3, board_size=10, workers=2, chunk_size=1)
+
+    self.assertEqual([r.moves for r in serial], [r.moves for r in parallel])
+
+  def test_summary(self):
+    results = run_games(3, ['first', 'first'], board_size=10)
+    summary = summarize(results, 1.0)
+
+    self.assertEqual(3, summary['games'])
+    self.assertEqual(3, sum(summary['wins']) + summary['draws'])
+    self.assertEqual(sum(len(r.moves) for r in results), summary['moves_per_second'])
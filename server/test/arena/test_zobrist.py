@@ -0,0 +1,82 @@
+import unittest
+
+from arena.logic.game import Board
+from arena.logic.piece import Orientation, Piece
+from arena.logic.zobrist import TranspositionTable
+
+
+class ZobristTest(unittest.TestCase):
+  def setUp(self):
+    self.piece1 = Piece(2, 2, [0, 1, 2, 3, 4, 5, 6, 7])
+    self.piece2 = Piece(1, 3, [0, 1, 2, 3, 4, 5, 6, 7])
+    self.piece3 = Piece(1, 3, [6, 7])
+
+  def board(self, **kwargs):
+    board = Board(8, **kwargs)
+    board.place_initial(self.piece1)
+    return board
+
+  def test_independent_of_move_order(self):
+    board1 = self.board()
+    board1.place(self.piece2, 5, 3, Orientation.South, None)
+    board1.place(self.piece2, 2, 6, Orientation.East, None)
+
+    board2 = self.board()
+    board2.place(self.piece2, 2, 6, Orientation.East, None)
+    board2.place(self.piece2, 5, 3, Orientation.South, None)
+
+    self.assertEqual(board1.zobrist, board2.zobrist)
+
+  def test_distinguishes_positions(self):
+    board1 = self.board()
+    board1.place(self.piece2, 5, 3, Orientation.South, None)
+
+    board2 = self.board()
+    board2.place(self.piece3, 5, 3, Orientation.South, None)
+
+    board3 = self.board()
+    board3.place(self.piece2, 5, 3, Orientation.North, None)
+
+    hashes = {board1.zobrist, board2.zobrist, board3.zobrist, self.board().zobrist}
+    self.assertEqual(4, len(hashes))
+
+  def test_unplace_restores_hash(self):
+    board = self.board()
+    initial = board.zobrist
+    board.place(self.piece2, 5, 3, Orientation.South, None)
+    board.unplace()
+
+    self.assertNotEqual(0, initial)
+    self.assertEqual(initial, board.zobrist)
+
+  def test_shared_placements(self):
+    transpositions = TranspositionTable()
+    board1 = self.board(transpositions=transpositions)
+    board2 = self.board(transpositions=transpositions)
+
+    placements1 = [(p.x, p.y, p.orientation) for p in board1.valid_placements(self.piece2)]
+    placements2 = [(p.x, p.y, p.orientation) for p in board2.valid_placements(self.piece2)]
+
+    self.assertListEqual(placements1, placements2)
+    self.assertEqual(1, len(transpositions))
+    self.assertEqual(1, transpositions.hits)
+    self.assertTrue(board2.has_valid_placement(self.piece2))
+
+
+class TranspositionTableTest(unittest.TestCase):
+  def test_evicts_least_recently_used(self):
+    table = TranspositionTable(maxsize=2)
+    table.put('a', 1)
+    table.put('b', 2)
+    table.get('a')
+    table.put('c', 3)
+
+    self.assertIn('a', table)
+    self.assertNotIn('b', table)
+    self.assertIn('c', table)
+    self.assertEqual(2, len(table))
+
+  def test_get_missing(self):
+    table = TranspositionTable()
+    self.assertIsNone(table.get('a'))
+    self.assertEqual(1, table.misses)
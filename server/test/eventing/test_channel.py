@@ -0,0 +1,88 @@
+import asyncio as aio
+import unittest
+
+from eventing.channel import Channel, Priority
+from eventing.event_queue import Event, EventQueue
+
+
+class ControlEvent(Event):
+  priority = Priority.Control
+
+
+class BulkEvent(Event):
+  priority = Priority.Bulk
+
+
+class ChannelTest(unittest.IsolatedAsyncioTestCase):
+  async def test_urgent_events_first(self):
+    channel = Channel()
+    bulk, normal, control = BulkEvent(), Event(), ControlEvent()
+    for event in [bulk, normal, control]:
+      await channel.put(event)
+
+    self.assertListEqual([control, normal, bulk],
+                         [await channel.get() for _ in range(3)])
+
+  async def test_put_waits_for_space(self):
+    channel = Channel(maxsize=1)
+    await channel.put(Event())
+    put = aio.create_task(channel.put(Event()))
+
+    await aio.sleep(0)
+    self.assertFalse(put.done())
+    self.assertEqual(1, channel.stats['blocked', Priority.Normal])
+
+    await channel.get()
+    await put
+    self.assertEqual(1, channel.qsize())
+
+  async def test_lanes_bounded_separately(self):
+    channel = Channel(maxsize=1)
+    await channel.put(Event())
+
+    await aio.wait_for(channel.put(ControlEvent()), 1)
+    self.assertDictEqual({Priority.Control: 1, Priority.Normal: 1, Priority.Bulk: 0},
+                         channel.depths())
+
+  async def test_overflow(self):
+    channel = Channel(maxsize=1)
+    await channel.put(Event())
+    await channel.put(Event(), block=False)
+
+    self.assertEqual(2, channel.qsize())
+    self.assertEqual(1, channel.stats['overflowed', Priority.Normal])
+
+  async def test_join(self):
+    channel = Channel()
+    await channel.put(Event())
+    join = aio.create_task(channel.join())
+
+    await channel.get()
+    await aio.sleep(0)
+    self.assertFalse(join.done())
+
+    channel.task_done()
+    await aio.wait_for(join, 1)
+
+
+class BoundedEventQueueTest(unittest.IsolatedAsyncioTestCase):
+  async def test_handlers_do_not_wait_for_space(self):
+    event_queue = EventQueue(maxsize=1)
+    received = []
+
+    async def reply(event):
+      received.append(event)
+      if len(received) == 1:
+        for _ in range(3):
+          await event.event_queue.publish(Event())
+
+    event_queue.register(Event, reply)
+    task = aio.create_task(event_queue.run())
+    try:
+      await event_queue.publish(Event())
+      await aio.wait_for(event_queue.join(), 1)
+    finally:
+      task.cancel()
+
+    self.assertEqual(4, len(received))
+    self.assertEqual(2, event_queue.queue.stats['overflowed', Priority.Normal])
@@ -0,0 +1,309 @@
+import asyncio as aio
+import functools
+import unittest
+
+from eventing.event_queue import Event, EventQueue, HandlerFailedEvent, ShardedEventQueue
+
+
+class BaseEvent(Event):
+  pass
+
+
+class DerivedEvent(BaseEvent):
+  pass
+
+
+class AsyncHandler(object):
+  def __init__(self):
+    self.events = []
+
+  async def __call__(self, event):
+    self.events.append(event)
+
+
+class EventQueueTest(unittest.IsolatedAsyncioTestCase):
+  async def asyncSetUp(self):
+    self.event_queue = EventQueue()
+    self.task = aio.create_task(self.event_queue.run())
+
+  async def asyncTearDown(self):
+    self.task.cancel()
+    await aio.gather(self.task, return_exceptions=True)
+
+  async def deliver(self, *events):
+    for event in events:
+      await self.event_queue.publish(event)
+    await self.event_queue.join()
+
+  async def test_base_class_handlers_receive_subclasses(self):
+    received = []
+    self.event_queue.register(BaseEvent, received.append)
+
+    base = BaseEvent()
+    derived = DerivedEvent()
+    await self.deliver(base, derived)
+
+    self.assertListEqual([base, derived], received)
+
+  async def test_specific_handlers_first(self):
+    received = []
+    self.event_queue.register(BaseEvent, lambda e: received.append('base'))
+    self.event_queue.register(DerivedEvent, lambda e: received.append('derived'))
+
+    await self.deliver(DerivedEvent())
+
+    self.assertListEqual(['derived', 'base'], received)
+
+  async def test_registration_invalidates_dispatch_table(self):
+    received = []
+    self.event_queue.register(DerivedEvent, lambda e: received.append('derived'))
+    await self.deliver(DerivedEvent())
+
+    self.event_queue.register(BaseEvent, lambda e: received.append('base'))
+    await self.deliver(DerivedEvent())
+
+    self.assertListEqual(['derived', 'derived', 'base'], received)
+
+  async def test_async_handlers(self):
+    handler = AsyncHandler()
+    received = []
+
+    async def coroutine_handler(event):
+      received.append(event)
+
+    self.event_queue.register(BaseEvent, handler)
+    self.event_queue.register(BaseEvent, coroutine_handler)
+
+    event = BaseEvent()
+    await self.deliver(event)
+
+    self.assertListEqual([event], handler.events)
+    self.assertListEqual([event], received)
+
+  async def test_sync_handlers_returning_coroutines(self):
+    handler = AsyncHandler()
+    self.event_queue.register(BaseEvent, lambda e: handler(e))
+    self.event_queue.register(BaseEvent, functools.partial(handler.__call__))
+
+    event = BaseEvent()
+    await self.deliver(event)
+
+    self.assertListEqual([event, event], handler.events)
+
+  async def test_failing_handler(self):
+    failures = []
+    received = []
+    error = ValueError()
+
+    def failing(event):
+      raise error
+
+    self.event_queue.register(HandlerFailedEvent, failures.append)
+    self.event_queue.register(BaseEvent, failing)
+    self.event_queue.register(BaseEvent, received.append)
+
+    await self.deliver(BaseEvent())
+
+    self.assertEqual(1, len(received))
+    self.assertEqual(1, len(failures))
+    self.assertIs(failing, failures[0].failed_handler)
+    self.assertIs(error, failures[0].exception)
+
+
+class ClientEvent(Event):
+  routed_by = 'id'
+
+  def __init__(self, id):
+    super().__init__()
+    self.id = id
+
+
+class ConcurrentEventQueueTest(EventQueueTest):
+  async def asyncSetUp(self):
+    self.event_queue = EventQueue(concurrent=True)
+    self.task = aio.create_task(self.event_queue.run())
+
+  async def asyncTearDown(self):
+    self.event_queue.cancel()
+    await super().asyncTearDown()
+
+  async def test_lanes_run_concurrently(self):
+    release = aio.Event()
+    received = []
+
+    async def slow(event):
+      await release.wait()
+      received.append('slow')
+
+    def fast(event):
+      received.append('fast')
+      release.set()
+
+    self.event_queue.register(BaseEvent, slow, lane='slow')
+    self.event_queue.register(BaseEvent, fast)
+
+    await self.deliver(BaseEvent())
+
+    self.assertListEqual(['fast', 'slow'], received)
+
+  async def test_lane_keeps_order(self):
+    received = []
+
+    async def handler(event):
+      # later events would overtake without the lane
+      await aio.sleep(0.001 * (3 - len(received)))
+      received.append(event)
+
+    self.event_queue.register(BaseEvent, handler, lane='lane')
+
+    events = [BaseEvent() for _ in range(3)]
+    await self.deliver(*events)
+
+    self.assertListEqual(events, received)
+
+  async def test_keyed_lanes(self):
+    received = []
+    release = aio.Event()
+
+    async def handler(event):
+      if event.id == 1:
+        await release.wait()
+      else:
+        release.set()
+      received.append(event.id)
+
+    self.event_queue.register(ClientEvent, handler, lane=lambda event: event.id)
+
+    await self.deliver(ClientEvent(1), ClientEvent(1), ClientEvent(2))
+
+    self.assertListEqual([2, 1, 1], received)
+    self.assertDictEqual({}, self.event_queue.lanes)
+
+  async def test_lane_continues_after_failure(self):
+    failures = []
+    received = []
+
+    def handler(event):
+      if not received:
+        received.append(None)
+        raise ValueError()
+      received.append(event)
+
+    self.event_queue.register(HandlerFailedEvent, failures.append)
+    self.event_queue.register(BaseEvent, handler, lane='lane')
+
+    first, second = BaseEvent(), BaseEvent()
+    await self.deliver(first, second)
+
+    self.assertListEqual([None, second], received)
+    self.assertEqual(1, len(failures))
+    self.assertIs(first, failures[0].event)
+
+
+class ShardedEventQueueTest(unittest.IsolatedAsyncioTestCase):
+  async def asyncSetUp(self):
+    self.event_queue = ShardedEventQueue(4)
+    self.task = aio.create_task(self.event_queue.run())
+
+  async def asyncTearDown(self):
+    self.task.cancel()
+    await aio.gather(self.task, return_exceptions=True)
+
+  async def deliver(self, *events):
+    for event in events:
+      await self.event_queue.publish(event)
+    await self.event_queue.join()
+
+  def test_routing(self):
+    shards = self.event_queue.shards
+
+    self.assertIs(shards[0], self.event_queue.shard_for(BaseEvent()))
+    for id in range(8):
+      self.assertIs(shards[hash(id) % 4], self.event_queue.shard_for(ClientEvent(id)))
+
+  async def test_events_of_a_key_in_order(self):
+    received = []
+    self.event_queue.register(ClientEvent, received.append)
+
+    events = [ClientEvent(id) for _ in range(3) for id in range(8)]
+    await self.deliver(*events)
+
+    for id in range(8):
+      expected = [e for e in events if e.id == id]
+      self.assertListEqual(expected, [e for e in received if e.id == id])
+
+  async def test_handlers_publish_through_shards(self):
+    received = []
+
+    async def reply(event):
+      received.append(event.event_queue)
+      if event.id < 8:
+        await event.event_queue.publish(ClientEvent(event.id + 1))
+
+    self.event_queue.register(ClientEvent, reply)
+
+    await self.deliver(ClientEvent(0))
+
+    self.assertEqual(9, len(received))
+    for event_queue in received:
+      self.assertIs(self.event_queue, event_queue)
+
+  async def test_slow_shard_does_not_block_others(self):
+    release = aio.Event()
+    received = []
+
+    async def handler(event):
+      if event.id == 0:
+        await release.wait()
+      else:
+        release.set()
+      received.append(event.id)
+
+    self.event_queue.register(ClientEvent, handler)
+
+    await self.deliver(ClientEvent(0), ClientEvent(1))
+
+    self.assertListEqual([1, 0], received)
+
+
+class BatchEventQueueTest(unittest.IsolatedAsyncioTestCase):
+  async def test_batches_of_queued_events(self):
+    event_queue = EventQueue()
+    received = []
+    batches = []
+    event_queue.register(BaseEvent, received.append)
+    event_queue.register_batch(BaseEvent, batches.append)
+
+    events = [BaseEvent(), BaseEvent(), DerivedEvent(), BaseEvent()]
+    for event in events:
+      await event_queue.publish(event)
+
+    task = aio.create_task(event_queue.run())
+    try:
+      await event_queue.join()
+    finally:
+      task.cancel()
+
+    self.assertListEqual(events, received)
+    self.assertListEqual([events[:2], events[2:3], events[3:]], batches)
+
+  async def test_coalesce(self):
+    class IdempotentEvent(Event):
+      coalesce = True
+
+    event_queue = EventQueue()
+    received = []
+    event_queue.register(IdempotentEvent, received.append)
+
+    for _ in range(3):
+      await event_queue.publish(IdempotentEvent())
+
+    task = aio.create_task(event_queue.run())
+    try:
+      await event_queue.join()
+      await event_queue.publish(IdempotentEvent())
+      await event_queue.join()
+    finally:
+      task.cancel()
+
+    self.assertEqual(2, len(received))
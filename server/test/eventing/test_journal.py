@@ -0,0 +1,71 @@
+import asyncio as aio
+import os
+import tempfile
+import unittest
+
+from eventing.event_queue import Event
+from eventing.journal import HEADER, Codec, Journal, JournalError, read_journal, records
+
+
+class NumberEvent(Event):
+  def __init__(self, number):
+    super().__init__()
+    self.number = number
+
+
+def number_codec():
+  codec = Codec()
+  codec.register(1, NumberEvent,
+                 lambda event: event.number.to_bytes(4, 'little'),
+                 lambda payload: NumberEvent(int.from_bytes(payload, 'little')))
+  return codec
+
+
+class JournalTest(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.path = os.path.join(directory.name, 'journal')
+
+  def test_records(self):
+    codec = number_codec()
+    data = codec.encode(NumberEvent(7), 100) + codec.encode(NumberEvent(8), 200)
+
+    entries = [(code, timestamp, bytes(payload)) for code, timestamp, payload in records(data)]
+
+    self.assertListEqual([(1, 100, b'\x07\0\0\0'), (1, 200, b'\x08\0\0\0')], entries)
+
+  def test_truncated_record_ends_journal(self):
+    data = number_codec().encode(NumberEvent(7))
+
+    self.assertEqual(1, len(list(records(data + data[:-1]))))
+    self.assertEqual(1, len(list(records(data + data[:HEADER.size - 1]))))
+
+  def test_unknown_record_type(self):
+    with self.assertRaises(JournalError):
+      number_codec().decode(2, b'')
+
+  async def test_write_and_read(self):
+    journal = Journal(self.path, number_codec(), {'seed': 3})
+    task = aio.create_task(journal.run())
+
+    for number in range(5):
+      journal(NumberEvent(number))
+    # let the first commit start, the rest is committed in one go later
+    await aio.sleep(0.01)
+    for number in range(5, 10):
+      journal(NumberEvent(number))
+
+    task.cancel()
+    await aio.gather(task, return_exceptions=True)
+    journal.close()
+
+    entries = [entry for _, entry in read_journal(self.path, number_codec())]
+    self.assertDictEqual({'seed': 3}, entries[0])
+    self.assertListEqual(list(range(10)), [event.number for event in entries[1:]])
+    self.assertLessEqual(journal.commits, 2)
+
+  def test_read_empty_journal(self):
+    open(self.path, 'wb').close()
+
+    self.assertListEqual([], list(read_journal(self.path, number_codec())))
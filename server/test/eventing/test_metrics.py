@@ -0,0 +1,108 @@
+import asyncio as aio
+import unittest
+
+from eventing.event_queue import Event, EventQueue
+from eventing.metrics import Histogram, Metrics, MetricsServer
+
+
+class PingEvent(Event):
+  pass
+
+
+class Handler(object):
+  def __call__(self, event):
+    pass
+
+
+class HistogramTest(unittest.TestCase):
+  def test_samples_are_cumulative(self):
+    histogram = Histogram((0.1, 1.0))
+    for value in [0.05, 0.1, 0.5, 2.0]:
+      histogram.observe(value)
+
+    self.assertListEqual([('0.1', 2), ('1.0', 3), ('+Inf', 4)], list(histogram.samples()))
+    self.assertAlmostEqual(2.65, histogram.sum)
+
+
+class MetricsTest(unittest.IsolatedAsyncioTestCase):
+  async def asyncSetUp(self):
+    self.metrics = Metrics()
+    self.event_queue = EventQueue(metrics=self.metrics)
+    self.task = aio.create_task(self.event_queue.run())
+
+  async def asyncTearDown(self):
+    self.task.cancel()
+    await aio.gather(self.task, return_exceptions=True)
+
+  async def test_handlers_and_failures(self):
+    def failing(event):
+      raise ValueError()
+
+    self.event_queue.register(PingEvent, Handler())
+    self.event_queue.register(PingEvent, failing)
+
+    for _ in range(3):
+      await self.event_queue.publish(PingEvent())
+    await self.event_queue.join()
+
+    self.assertEqual(3, self.metrics.handler_seconds['PingEvent', 'Handler'].count)
+    self.assertEqual(3, self.metrics.dispatch_seconds['PingEvent'].count)
+    self.assertEqual(3, self.metrics.queue_wait_seconds['PingEvent'].count)
+
+    failing_name = failing.__qualname__
+    self.assertEqual(3, self.metrics.handler_failures[failing_name])
+
+    text = self.metrics.render()
+    self.assertIn('tushan_handler_seconds_count{event="PingEvent",handler="Handler"} 3', text)
+    self.assertIn(f'tushan_handler_failures_total{{handler="{failing_name}"}} 3', text)
+    self.assertIn('tushan_queue_depth{priority="Normal"} 0', text)
+    self.assertIn('tushan_events_total{outcome="published",priority="Normal"} 6', text)
+
+  async def test_events_without_publish_stamp(self):
+    self.event_queue.register(PingEvent, Handler())
+
+    # bypasses publish, as events arriving in other ways might
+    await self.event_queue.queue.put(PingEvent())
+    await self.event_queue.join()
+
+    self.assertEqual(1, self.metrics.dispatch_seconds['PingEvent'].count)
+    self.assertEqual(0, self.metrics.queue_wait_seconds['PingEvent'].count)
+
+  async def test_server(self):
+    server = await MetricsServer(self.metrics, '127.0.0.1', 0).start()
+    port = server.sockets[0].getsockname()[1]
+    try:
+      reader, writer = await aio.open_connection('127.0.0.1', port)
+      writer.write(b'GET /metrics HTTP/1.0\r\n\r\n')
+      response = await reader.read()
+      writer.close()
+    finally:
+      server.close()
+      await server.wait_closed()
+
+    head, body = response.split(b'\r\n\r\n', 1)
+    self.assertTrue(head.startswith(b'HTTP/1.0 200 OK'))
+    self.assertEqual(self.metrics.render().encode('utf-8'), body)
+
+
+class ConcurrentMetricsTest(unittest.IsolatedAsyncioTestCase):
+  async def test_dispatch_waits_for_handlers_in_lanes(self):
+    metrics = Metrics()
+    event_queue = EventQueue(concurrent=True, metrics=metrics)
+
+    async def slow(event):
+      await aio.sleep(0.05)
+
+    event_queue.register(PingEvent, slow, lane='slow')
+    event_queue.register(PingEvent, Handler(), lane='fast')
+    task = aio.create_task(event_queue.run())
+    try:
+      await event_queue.publish(PingEvent())
+      await event_queue.join()
+    finally:
+      task.cancel()
+      await aio.gather(task, return_exceptions=True)
+
+    dispatch = metrics.dispatch_seconds['PingEvent']
+    self.assertEqual(1, dispatch.count)
+    self.assertGreaterEqual(dispatch.sum, 0.05)
@@ -0,0 +1,145 @@
+import asyncio as aio
+import unittest
+
+from arena.events import FirstTurnEvent, GameStartedEvent, MoveAcceptedEvent
+from arena.logic.game import Board, Game, Player
+from arena.logic.piece import Piece
+from net.server import Broadcaster, Outbox, SlowClientPolicy
+
+
+class Writer(object):
+  """A client's StreamWriter, drain blocks while the client is stalled."""
+  def __init__(self, stalled=False):
+    self.data = b''
+    self.closed = False
+    self.flowing = aio.Event()
+    if not stalled:
+      self.flowing.set()
+
+  def write(self, data):
+    self.data += data
+
+  async def drain(self):
+    await self.flowing.wait()
+
+  def close(self):
+    self.closed = True
+
+
+class OutboxTest(unittest.IsolatedAsyncioTestCase):
+  async def stalled_outbox(self, policy, limit=4):
+    writer = Writer(stalled=True)
+    outbox = Outbox(writer, limit=limit, policy=policy)
+    self.addAsyncCleanup(self.close, outbox)
+
+    # the first message is written, then the writer task waits in drain
+    outbox.send(b'aa')
+    await aio.sleep(0)
+    return writer, outbox
+
+  async def overflowing_outbox(self, policy):
+    writer, outbox = await self.stalled_outbox(policy)
+    outbox.send(b'bb')
+    outbox.send(b'cc')
+    outbox.send(b'dd')
+    return writer, outbox
+
+  async def close(self, outbox):
+    outbox.close()
+    await aio.gather(outbox.task, return_exceptions=True)
+
+  async def flush(self, writer, outbox):
+    writer.flowing.set()
+    while outbox.messages:
+      await aio.sleep(0)
+
+  async def test_drop(self):
+    writer, outbox = await self.overflowing_outbox(SlowClientPolicy.Drop)
+
+    self.assertEqual(4, outbox.buffered)
+    self.assertEqual(1, outbox.dropped)
+
+    await self.flush(writer, outbox)
+    self.assertEqual(b'aabbcc', writer.data)
+
+  async def test_coalesce_keeps_other_messages(self):
+    writer, outbox = await self.stalled_outbox(SlowClientPolicy.Coalesce, limit=20)
+    game = object()
+
+    outbox.send(b'<moved 1>', game)
+    outbox.send(b'<firstturn>')
+    outbox.send(b'<moved 2>', game)
+    outbox.send(b'<moved 3>', game)
+
+    self.assertEqual(2, outbox.dropped)
+    self.assertFalse(writer.closed)
+
+    await self.flush(writer, outbox)
+    self.assertEqual(b'aa<firstturn><moved 3>', writer.data)
+
+  async def test_coalesce_disconnects_if_not_enough(self):
+    writer, outbox = await self.stalled_outbox(SlowClientPolicy.Coalesce)
+
+    outbox.send(b'bb', object())
+    outbox.send(b'cc')
+    outbox.send(b'dd', object())
+
+    self.assertTrue(writer.closed)
+    self.assertEqual(0, outbox.dropped)
+
+  async def test_disconnect(self):
+    writer, outbox = await self.overflowing_outbox(SlowClientPolicy.Disconnect)
+
+    self.assertTrue(writer.closed)
+    outbox.send(b'ee')
+    self.assertEqual(b'aa', writer.data)
+
+
+class BroadcasterTest(unittest.IsolatedAsyncioTestCase):
+  async def test_stalled_client_does_not_block_others(self):
+    broadcaster = Broadcaster()
+    stalled, flowing = Writer(stalled=True), Writer()
+    broadcaster.connect(1, stalled)
+    broadcaster.connect(2, flowing)
+
+    broadcaster.send(b'first', broadcaster.clients)
+    broadcaster.send(b'second', broadcaster.clients)
+    for _ in range(3):
+      await aio.sleep(0)
+
+    self.assertEqual(b'firstsecond', flowing.data)
+    self.assertEqual(b'first', stalled.data)
+    self.assertListEqual([({'client': 1}, 6), ({'client': 2}, 0)],
+                         list(broadcaster.buffered_bytes()))
+
+    broadcaster.disconnect(1)
+    self.assertTrue(stalled.closed)
+    broadcaster.close()
+
+  async def test_events_reach_the_players_of_their_game(self):
+    broadcaster = Broadcaster()
+    writers = {id: Writer() for id in range(4)}
+    for id, writer in writers.items():
+      broadcaster.connect(id, writer)
+
+    sides = Board.Side
+    game1, game2 = [Game(Board(8), [Player(a, [sides.North, sides.South]),
+                                    Player(b, [sides.West, sides.East])], Piece.official_pieces())
+                    for a, b in [(0, 1), (2, 3)]]
+    broadcaster([GameStartedEvent(game1), GameStartedEvent(game2), GameStartedEvent(game1)])
+    await aio.sleep(0)
+
+    self.assertEqual(2, writers[0].data.count(b'gamestarted'))
+    self.assertEqual(1, writers[2].data.count(b'gamestarted'))
+    self.assertEqual(writers[0].data, writers[1].data)
+    self.assertEqual(writers[2].data, writers[3].data)
+    self.assertIn(b'"id": "2"', writers[2].data)
+    self.assertNotIn(b'"id": "2"', writers[0].data)
+    broadcaster.close()
+
+  def test_only_accepted_moves_are_snapshots(self):
+    broadcaster = Broadcaster()
+    game = object()
+
+    self.assertIs(game, broadcaster.snapshot([MoveAcceptedEvent(game, None, None)]))
+    self.assertIsNone(broadcaster.snapshot([FirstTurnEvent(game, None)]))
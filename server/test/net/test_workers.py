@@ -0,0 +1,116 @@
+import asyncio as aio
+import json
+import unittest
+import uuid
+
+from arena.lobby import Lobby
+from arena.message_translator import MessageTranslator
+from eventing.event_queue import Event, EventQueue, Priority
+from net.server import ClientConnectedEvent, MessageReceivedEvent
+from net.workers import WorkerPool
+
+
+SETTINGS = {
+  'board_size': 18,
+  'pieces': 'official',
+  'piece_count': 28,
+  'piece_width': [1, 3],
+  'piece_height': [1, 3],
+  'seed': 5,
+}
+
+
+class WorkersStartedEvent(Event):
+  __slots__ = ()
+  priority = Priority.Control
+
+
+class ClientWriter(object):
+  """Collects what is sent to a client."""
+  def __init__(self):
+    self.data = b''
+    self.received = aio.Event()
+
+  def write(self, data):
+    self.data += data
+    self.received.set()
+
+  async def drain(self):
+    pass
+
+  def messages(self):
+    decoder = json.JSONDecoder()
+    text = self.data.decode('utf-8')
+    messages = []
+    while text:
+      message, end = decoder.raw_decode(text)
+      messages.append(message)
+      text = text[end:]
+    return messages
+
+
+class WorkerPoolTest(unittest.IsolatedAsyncioTestCase):
+  async def asyncSetUp(self):
+    self.event_queue = EventQueue()
+    self.pool = WorkerPool(2)
+    self.event_queue.register_class(self.pool.broadcaster)
+    self.event_queue.register(WorkersStartedEvent, Lobby.from_settings(SETTINGS))
+    self.event_queue.register(WorkersStartedEvent, MessageTranslator())
+    await self.pool.start(self.event_queue)
+    await self.event_queue.publish(WorkersStartedEvent())
+    self.task = aio.create_task(self.event_queue.run())
+
+  async def asyncTearDown(self):
+    await self.pool.stop()
+    self.task.cancel()
+    await aio.gather(self.task, return_exceptions=True)
+
+  async def connect(self):
+    client = uuid.uuid4()
+    writer = ClientWriter()
+    await self.event_queue.publish(ClientConnectedEvent(client, None, writer))
+    return client, writer
+
+  async def receive(self, writer, message_type, count=1):
+    while [m['type'] for m in writer.messages()].count(message_type) < count:
+      writer.received.clear()
+      await aio.wait_for(writer.received.wait(), 30)
+
+  def last(self, writer, message_type):
+    return [m for m in writer.messages() if m['type'] == message_type][-1]
+
+  def game_of(self, writer):
+    return self.last(writer, 'firstturn')['game']
+
+  async def test_games_run_at_once_on_the_workers(self):
+    clients = [await self.connect() for _ in range(4)]
+    writers = {client: writer for client, writer in clients}
+
+    for writer in writers.values():
+      await self.receive(writer, 'firstturn')
+    self.assertListEqual([1, 1], self.pool.load)
+
+    # every client only hears of its own game
+    first = self.game_of(writers[clients[0][0]])
+    players = [uuid.UUID(player['id']) for player in first['players']]
+    for client, writer in writers.items():
+      types = [m['type'] for m in writer.messages()]
+      self.assertListEqual(['gamestarted', 'firstturn'], types)
+      self.assertEqual(client in players, self.game_of(writer) == first)
+
+    worker = self.pool.workers[players[0]]
+    # a move far from the other pieces disqualifies its player
+    move = {'type': 'move', 'x': 0, 'y': 0, 'orientation': 'north'}
+    await self.event_queue.publish(MessageReceivedEvent(players[0], move))
+
+    for player in players:
+      await self.receive(writers[player], 'firstturn', 2)
+      types = [m['type'] for m in writers[player].messages()]
+      self.assertListEqual(['gamestarted', 'firstturn', 'gamecancelled',
+                            'gamestarted', 'firstturn'], types)
+      self.assertEqual('invalid_move', self.last(writers[player], 'gamecancelled')['reason'])
+
+    # the rematch is judged by the worker that became free
+    self.assertListEqual([1, 1], self.pool.load)
+    self.assertEqual(worker, self.pool.workers[players[0]])
+    self.assertEqual(worker, self.pool.workers[players[1]])